@@ -13,14 +13,26 @@ PROCESSED_DIR = DATA_DIR / "processed"
 
 # --- File Watching ---
 WATCH_DIRECTORY = str(DOCUMENTS_DIR)
-SUPPORTED_EXTENSIONS = [".pdf", ".docx", ".txt", ".md", ".html", ".csv", ".json"]
+SUPPORTED_EXTENSIONS = frozenset({".pdf", ".docx", ".txt", ".md", ".html", ".csv", ".json"})
+# Same extensions for str.endswith() checks while scanning directories
+SUPPORTED_EXTENSIONS_TUPLE = tuple(sorted(SUPPORTED_EXTENSIONS))
+# Editor swap/backup files, partial downloads, Office lock files and dotfiles
+IGNORED_FILE_PREFIXES = (".", "~")
+IGNORED_FILE_SUFFIXES = ("~", ".swp", ".swx", ".part", ".tmp", ".crdownload")
 RECURSIVE_WATCH = True
+WATCH_BACKEND = "watchfiles"  # or "watchdog"
 PROCESSING_DELAY_MS = 500
 MAX_RETRY_ATTEMPTS = 3
 
 # --- Document Processing ---
-CHUNK_SIZE = 512
-CHUNK_OVERLAP = 51
+CHUNK_SIZE = 1024  # characters (~200-250 MiniLM tokens, inside its 256-token window)
+CHUNK_OVERLAP = 128
+CHUNK_SEPARATORS = ["\n\n", "\n", ". ", ", ", " ", ""]
+# Per-extension (chunk_size, chunk_overlap, separators); other types use the defaults above
+CHUNK_SETTINGS_BY_EXTENSION = {
+    ".md": (CHUNK_SIZE, CHUNK_OVERLAP, ["\n# ", "\n## ", "\n### ", "\n\n", "\n", ". ", " ", ""]),
+    ".csv": (512, 0, ["\n", ",", " ", ""]),
+}
 MAX_FILE_SIZE_MB = 100
 
 # --- Vector Store ---
@@ -32,6 +44,11 @@ COLLECTION_STRATEGY = "single"  # or "per_type"
 MCP_HOST = "localhost"
 MCP_PORT = 8000
 API_KEY = os.getenv("API_KEY", None)  # Optional authentication
+# /health rescans data/ after this long, or sooner once the processed state changes
+STORAGE_CACHE_TTL_SEC = 60
+# Concurrent /search requests are answered together, up to this many per index query
+SEARCH_BATCH_SIZE = 16
+SEARCH_BATCH_WAIT_MS = 2  # How long a batch waits for more queries before it runs
 
 # --- Logging ---
 LOG_LEVEL = "INFO"
@@ -41,9 +58,26 @@ LOG_BACKUP_COUNT = 5
 LOG_ROTATION = "size"  # "size", "time", or "both"
 
 # --- Performance ---
-BATCH_SIZE = 10
+BATCH_SIZE = 10  # Files per watcher processing batch
+EMBED_BATCH_CHUNKS = 256  # Startup ingestion embeds chunks of several files once this many are ready
 WORKER_THREADS = 4
 CHUNK_CACHE_SIZE = 1000
+QUERY_CACHE_SIZE = 1024  # Cached query embeddings and search results
+# Skip the startup scan when the last run shut down cleanly and the watcher kept state current.
+# Off by default: edits made while the system was not running would go unnoticed until touched again.
+TRUST_CLEAN_SHUTDOWN = False
+
+# --- Search ---
+# HNSW index of newly created collections (existing ones keep the settings they were built with,
+# except HNSW_SEARCH_EF, which is applied to them on startup)
+HNSW_SPACE = "cosine"  # vector-only scores (HYBRID_SEARCH off) are 1 - distance, i.e. cosine similarity
+HNSW_M = 32  # Graph links per vector: more is better recall, more memory
+HNSW_CONSTRUCTION_EF = 200  # Build-time candidate list: better graph, slower inserts
+HNSW_SEARCH_EF = 64  # Query-time candidate list; keep at least 2x the typical search limit
+# Merge BM25 keyword matches into semantic results. Scores are then fused ranks, not similarities:
+# 1.0 for a chunk ranked first by both searches, 0.5 for one ranked first by only one of them
+HYBRID_SEARCH = True
+RRF_K = 60  # Reciprocal rank fusion constant; larger values flatten rank differences
 
 def setup_logging():
     """Configures loguru for console and file logging."""
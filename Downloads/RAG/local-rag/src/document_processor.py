@@ -2,26 +2,227 @@
 V2: Only processes new/changed files
 CRITICAL: This prevents 1GB datasets from reprocessing on every startup
 """
+import asyncio
+import codecs
 import logging
-from typing import List, Dict
+import mmap
+import multiprocessing
+import re
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Dict
 from datetime import datetime
 import os
+import sys
 from src import config
 import fitz  # PyMuPDF
 import docx
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Leading bytes of binary formats, checked before handing a file to its parser
+FILE_SIGNATURES = {
+    ".pdf": b"%PDF-",
+    ".docx": b"PK\x03\x04",  # DOCX is a ZIP container
+}
+
+
+# Formats read as plain text (HTML and JSON markup included); cheap enough to parse in a
+# thread instead of a worker process
+PLAIN_TEXT_EXTENSIONS = frozenset({".txt", ".md", ".csv", ".html", ".json"})
+
+# Characters buffered before the splitter runs while streaming a document
+STREAM_WINDOW_CHARS = 64 * 1024
+TEXT_READ_CHARS = 64 * 1024
+# Text files above this size are memory-mapped and decoded straight from the page cache
+MMAP_MIN_BYTES = 1024 * 1024
+
+
+def _has_signature(file_path: str, signature: bytes) -> bool:
+    """Cheaply sniff the file header so corrupt or mislabeled files fail fast"""
+    with open(file_path, 'rb') as f:
+        return f.read(len(signature)) == signature
+
+
+def iter_text(file_path: str) -> Iterator[str]:
+    """Yield the text of a document piece by piece (pages, paragraphs or blocks)"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in FILE_SIGNATURES and not _has_signature(file_path, FILE_SIGNATURES[extension]):
+        logging.warning(f"Skipping {file_path}: content does not match its {extension} extension")
+        return
+    if extension == ".pdf":
+        with fitz.open(file_path) as doc:
+            for page in doc:
+                yield page.get_text()
+    elif extension == ".docx":
+        doc = docx.Document(file_path)
+        for i, para in enumerate(doc.paragraphs):
+            yield para.text if i == 0 else "\n" + para.text
+    elif extension in PLAIN_TEXT_EXTENSIONS:
+        if os.path.getsize(file_path) > MMAP_MIN_BYTES:
+            yield from _iter_mapped_text(file_path)
+            return
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            while block := f.read(TEXT_READ_CHARS):
+                yield block
+
+
+def _iter_mapped_text(file_path: str) -> Iterator[str]:
+    """Decode a large UTF-8 file block by block from a read-only memory map"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:
+            for offset in range(0, len(view), TEXT_READ_CHARS):
+                block = view[offset:offset + TEXT_READ_CHARS]
+                text = decoder.decode(block)
+                # Release the slice so the map can be closed
+                block.release()
+                yield text
+        yield decoder.decode(b'', final=True)
+
+
+class FastTextSplitter:
+    """
+    Greedy text splitter that finds every separator offset in a single regex pass,
+    then cuts each chunk at the highest-priority separator near its size limit.
+    Replaces the recursive per-separator re-scanning of LangChain's splitter.
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, separators: List[str]):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size.")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = [separator for separator in separators if separator]
+        self._priority = {separator: i for i, separator in enumerate(self.separators)}
+        # A lookahead matches at every position without consuming text, so overlapping
+        # separators are all found (the "\n# " inside "\n\n# "). Longer/higher-priority
+        # separators come first so they win at the same position.
+        self._pattern = re.compile(
+            "(?=(" + "|".join(re.escape(separator) for separator in self.separators) + "))"
+        ) if self.separators else None
+        self._cut_offsets = {separator: self._cut_offset(separator) for separator in self.separators}
+        # Separators cut before markup start a new section, which overlap never reaches back across
+        self._section_separators = frozenset(
+            separator for separator in self.separators if self._cut_offsets[separator] < len(separator)
+        )
+
+    @staticmethod
+    def _cut_offset(separator: str) -> int:
+        """Cut before markup such as "\\n# " (keeping it with the next chunk), else after the separator"""
+        stripped = separator.lstrip()
+        if stripped and len(stripped) < len(separator):
+            return len(separator) - len(stripped)
+        return len(separator)
+
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunks of at most chunk_size characters"""
+        breaks = [[] for _ in self.separators]  # ascending cut offsets per priority
+        all_breaks = []
+        section_starts = set()
+        if self._pattern:
+            for match in self._pattern.finditer(text):
+                separator = match.group(1)
+                offset = match.start() + self._cut_offsets[separator]
+                breaks[self._priority[separator]].append(offset)
+                all_breaks.append(offset)
+                if separator in self._section_separators:
+                    section_starts.add(offset)
+        # Overlapping matches can end out of order ("\n\n" at i and "\n" at i + 1 both cut at i + 2)
+        all_breaks.sort()
+
+        chunks = []
+        start, length = 0, len(text)
+        while start < length:
+            limit = start + self.chunk_size
+            end = length if limit >= length else self._find_cut(breaks, all_breaks, start, limit)
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= length:
+                break
+            start = end if end in section_starts else self._next_start(all_breaks, start, end)
+        return chunks
+
+    def _find_cut(self, breaks: List[List[int]], all_breaks: List[int], start: int, limit: int) -> int:
+        """Farthest cut of the best separator that keeps the chunk at least half full"""
+        floor = start + self.chunk_size // 2
+        for offsets in breaks:
+            i = bisect_right(offsets, limit) - 1
+            if i >= 0 and offsets[i] > floor:
+                return offsets[i]
+        i = bisect_right(all_breaks, limit) - 1
+        if i >= 0 and all_breaks[i] > start:
+            return all_breaks[i]
+        return limit  # no separator at all: hard cut
+
+    def _next_start(self, all_breaks: List[int], start: int, end: int) -> int:
+        """Start the next chunk at the first separator inside the overlap window"""
+        if not self.chunk_overlap:
+            return end
+        i = bisect_left(all_breaks, end - self.chunk_overlap)
+        if i < len(all_breaks) and start < all_breaks[i] < end:
+            return all_breaks[i]
+        return end
+
+
+def chunk_stream(pieces: Iterable[str], text_splitter, window: int = STREAM_WINDOW_CHARS) -> Iterator[str]:
+    """
+    Split a stream of text pieces into chunks while buffering only about `window`
+    characters. The tail after the last finished chunk is carried into the next
+    window, so the output matches splitting the whole text closely.
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) < window:
+            continue
+        chunks = text_splitter.split_text(buffer)
+        if len(chunks) < 2:
+            continue
+        yield from chunks[:-1]
+        # Carry the unfinished last chunk, including its original whitespace
+        tail_start = buffer.rfind(chunks[-1])
+        buffer = buffer[tail_start:] if tail_start >= 0 else chunks[-1]
+    if buffer:
+        yield from text_splitter.split_text(buffer)
+
 
 class DocumentProcessor:
     def __init__(self, vector_store, state_manager):
         """V2: Accepts a shared StateManager instance"""
         self.vector_store = vector_store
         self.state_manager = state_manager
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1024,
-            chunk_overlap=128,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", ", ", " ", ""],
+        self.text_splitter = self._make_splitter(
+            config.CHUNK_SIZE, config.CHUNK_OVERLAP, config.CHUNK_SEPARATORS
+        )
+        # Structured formats get their own boundaries: markdown headings, CSV rows
+        self._splitters = {
+            extension: self._make_splitter(*settings)
+            for extension, settings in config.CHUNK_SETTINGS_BY_EXTENSION.items()
+        }
+        # PDF/DOCX parsing is CPU-bound, so it runs in worker processes off the event loop.
+        # "spawn" avoids forking a process that already runs model and database threads.
+        self._pool = ProcessPoolExecutor(
+            max_workers=config.WORKER_THREADS,
+            mp_context=multiprocessing.get_context("spawn"),
         )
+        # Caps how many files of a batch are extracted at once (threads and pool alike)
+        self._prepare_slots = asyncio.Semaphore(config.WORKER_THREADS)
+        # Held by whoever applies changes to the store and state (file watcher, /process),
+        # so two passes never replace the same file's chunks at the same time
+        self.processing_lock = asyncio.Lock()
+
+    @staticmethod
+    def _make_splitter(chunk_size: int, chunk_overlap: int, separators: List[str]) -> FastTextSplitter:
+        return FastTextSplitter(chunk_size, chunk_overlap, separators)
+        
+    def get_splitter(self, file_path: str):
+        """Return the text splitter configured for the file's extension"""
+        extension = os.path.splitext(file_path)[1].lower()
+        return self._splitters.get(extension, self.text_splitter)
+
+    def shutdown(self):
+        """Stop the extraction worker processes"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
         
     async def process_changed_files_only(self):
         """MAIN METHOD: Only process files that actually changed"""
@@ -34,75 +235,148 @@ class DocumentProcessor:
             
         logging.info(f"Found {len(files_to_process)} files to process")
         
-        # Process in batches for performance
-        batch_size = 5
-        file_list = list(files_to_process)
-        for i in range(0, len(file_list), batch_size):
-            batch = file_list[i:i + batch_size]
-            await self.process_file_batch(batch)
+        # Files are extracted as a sliding window of tasks, so a slow file never holds
+        # up the rest and extraction keeps going while a batch is being embedded.
+        # Chunks are embedded and stored once enough have piled up, so many small
+        # files still feed the model full batches.
+        remaining = iter(files_to_process)
+        in_flight = {}  # task -> file path
+        pending = []
+        pending_chunks = 0
+        while True:
+            # Twice the extraction slots: the next files are queued up, memory stays bounded
+            while len(in_flight) < 2 * config.WORKER_THREADS:
+                file_path = next(remaining, None)
+                if file_path is None:
+                    break
+                in_flight[asyncio.create_task(self._prepare_file(file_path))] = file_path
+            if not in_flight:
+                break
+                
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                file_path = in_flight.pop(task)
+                if task.exception() is not None:
+                    logging.error(f"Failed to process {file_path}: {task.exception()}")
+                elif task.result() is not None:
+                    pending.append(task.result())
+                    pending_chunks += len(task.result()[2])
+                    
+            if pending_chunks >= config.EMBED_BATCH_CHUNKS:
+                await self._store_prepared(pending)
+                pending = []
+                pending_chunks = 0
+        if pending:
+            await self._store_prepared(pending)
             
         # Save state after processing all batches
         await self.state_manager.save_state()
         
     async def process_file_batch(self, file_paths: list):
         """Process multiple files efficiently"""
+        prepared = await self._prepare_batch(file_paths)
+        if prepared:
+            await self._store_prepared(prepared)
+            
+    async def _prepare_batch(self, file_paths: list) -> list:
+        """Extract and chunk every file concurrently; one failure never sinks the batch"""
+        results = await asyncio.gather(
+            *(self._prepare_file(path) for path in file_paths), return_exceptions=True
+        )
+        prepared = []
+        for file_path, result in zip(file_paths, results):
+            if isinstance(result, BaseException):
+                logging.error(f"Failed to process {file_path}: {result}")
+            elif result is not None:
+                prepared.append(result)
+        return prepared
         
-        for file_path in file_paths:
-            try:
-                # Get current signature before processing
-                signature = self.state_manager.get_content_signature(file_path)
-                
-                # Extract and process content
-                content = self.extract_text(file_path)
-                if not content:
-                    logging.warning(f"No content extracted from {file_path}, skipping.")
-                    continue
-
-                chunks = self.chunk_content(content, file_path)
-                
-                # Add to vector store
-                await self.vector_store.add_document_chunks(file_path, chunks)
-                
-                # Mark as processed with its signature
-                self.state_manager.mark_file_processed(file_path, signature)
+    async def _store_prepared(self, prepared: list):
+        """Embed and store the chunks of prepared files at once, then mark them processed"""
+        all_chunks = [chunk for _, _, chunks in prepared for chunk in chunks]
+        try:
+            await self.vector_store.add_chunks_bulk(all_chunks)
+        except Exception as e:
+            logging.error(f"Failed to store batch of {len(prepared)} files: {e}", exc_info=True)
+            return
+            
+        for file_path, signature, chunks in prepared:
+            # Mark as processed with its signature
+            self.state_manager.mark_file_processed(file_path, signature)
+            logging.info(f"Processed: {file_path} ({len(chunks)} chunks)")
+            
+    async def _prepare_file(self, file_path: str):
+        """Extract and chunk one file; returns (file_path, signature, chunks) or None"""
+        try:
+            splitter = self.get_splitter(file_path)
+            async with self._prepare_slots:
+                # Get current signature before processing; hashing reads the file,
+                # so it runs in a thread, concurrently with the batch's other files
+                signature = await asyncio.to_thread(self.state_manager.get_content_signature, file_path)
+                if not self.state_manager.is_file_changed(file_path, signature):
+                    # e.g. a metadata-only event from the watcher
+                    logging.info(f"Unchanged since last processed, skipping: {file_path}")
+                    return None
                 
-                logging.info(f"Processed: {file_path} ({len(chunks)} chunks)")
+                # Extract and split content off the event loop: plain text in a thread
+                # (no pickling of the chunks), PDF/DOCX parsing in a worker process
+                if os.path.splitext(file_path)[1].lower() in PLAIN_TEXT_EXTENSIONS:
+                    raw_chunks = await asyncio.to_thread(DocumentProcessor.split_document, file_path, splitter)
+                else:
+                    loop = asyncio.get_running_loop()
+                    raw_chunks = await loop.run_in_executor(
+                        self._pool, DocumentProcessor.split_document, file_path, splitter
+                    )
+            if not raw_chunks:
+                logging.warning(f"No content extracted from {file_path}, skipping.")
+                return None
                 
-            except Exception as e:
-                logging.error(f"Failed to process {file_path}: {e}", exc_info=True)
+            chunks = self.build_chunks(raw_chunks, file_path)
+            return file_path, signature, chunks
+            
+        except Exception as e:
+            logging.error(f"Failed to process {file_path}: {e}", exc_info=True)
+            return None
                 
-    def extract_text(self, file_path: str) -> str:
-        """Extract text from various file formats"""
-        extension = os.path.splitext(file_path)[1].lower()
+    @staticmethod
+    def extract_text(file_path: str) -> str:
+        """Extract text from various file formats (static so it can run in a worker process)"""
         text = ""
         try:
-            if extension == ".pdf":
-                doc = fitz.open(file_path)
-                text = "".join(page.get_text() for page in doc)
-                doc.close()
-            elif extension == ".docx":
-                doc = docx.Document(file_path)
-                text = "\n".join([para.text for para in doc.paragraphs])
-            elif extension in [".txt", ".md"]:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
+            text = "".join(iter_text(file_path))
         except Exception as e:
             logging.error(f"Error extracting text from {file_path}: {e}")
         return text
         
+    @staticmethod
+    def split_document(file_path: str, text_splitter) -> List[str]:
+        """Stream a document through the splitter without materializing its full text"""
+        try:
+            return list(chunk_stream(iter_text(file_path), text_splitter))
+        except Exception as e:
+            logging.error(f"Error extracting text from {file_path}: {e}")
+            return []
+        
     def chunk_content(self, content: str, file_path: str) -> List[Dict]:
         """Create chunks with metadata"""
-        raw_chunks = self.text_splitter.split_text(content)
-        chunks = []
+        return self.build_chunks(self.get_splitter(file_path).split_text(content), file_path)
+        
+    def build_chunks(self, raw_chunks: List[str], file_path: str) -> List[Dict]:
+        """Attach metadata to already split chunks"""
+        # Shared by every chunk of the file: one timestamp, one interned path string
+        processing_time = datetime.now().isoformat()
+        total_chunks = len(raw_chunks)
+        source = sys.intern(file_path)
         
-        for i, chunk_content in enumerate(raw_chunks):
-            chunks.append({
+        return [
+            {
                 'content': chunk_content,
                 'metadata': {
-                    'source': file_path,
+                    'source': source,
                     'chunk_index': i,
-                    'total_chunks': len(raw_chunks),
-                    'processing_time': datetime.now().isoformat()
+                    'total_chunks': total_chunks,
+                    'processing_time': processing_time
                 }
-            })
-        return chunks
+            }
+            for i, chunk_content in enumerate(raw_chunks)
+        ]
@@ -1,15 +1,37 @@
+import os
 import time
 import asyncio
-from pathlib import Path
+from typing import Dict, List, Tuple
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileSystemEvent
 from loguru import logger
 
+try:
+    from watchfiles import awatch
+except ImportError:  # watchfiles is optional; fall back to the watchdog observer
+    awatch = None
+
 from src import config
 from src.document_processor import DocumentProcessor
 from src.vector_store import VectorStore
 
 
+def is_watched_file(path: str) -> bool:
+    """
+    Checks whether a path is a supported document that is not a temporary file.
+
+    Args:
+        path (str): The path reported by the file system watcher.
+
+    Returns:
+        bool: True if events for this path should be processed.
+    """
+    name = os.path.basename(path)
+    if name.startswith(config.IGNORED_FILE_PREFIXES) or name.endswith(config.IGNORED_FILE_SUFFIXES):
+        return False
+    return os.path.splitext(name)[1].lower() in config.SUPPORTED_EXTENSIONS
+
+
 class DocumentEventHandler(FileSystemEventHandler):
     """
     Handles file system events for the document directory.
@@ -17,23 +39,35 @@ class DocumentEventHandler(FileSystemEventHandler):
     This class responds to file creation, modification, and deletion events,
     triggering document processing and vector store updates.
 
+    Watchdog dispatches events on its own thread, so the handlers only record
+    the latest event per path on the main event loop. A debounce task on that
+    loop flushes paths that have been quiet for PROCESSING_DELAY_MS, which
+    coalesces bursts of editor saves into a single processing pass.
+
     Attributes:
         vector_store (VectorStore): An instance of the vector store for database operations.
         document_processor (DocumentProcessor): An instance of the document processor.
+        loop (asyncio.AbstractEventLoop): The main event loop that runs the processing coroutines.
     """
 
-    def __init__(self, vector_store: VectorStore, document_processor: DocumentProcessor):
+    def __init__(self, vector_store: VectorStore, document_processor: DocumentProcessor,
+                 loop: asyncio.AbstractEventLoop):
         """
         Initializes the DocumentEventHandler.
 
         Args:
             vector_store (VectorStore): The vector store to interact with.
             document_processor (DocumentProcessor): The document processor to use.
+            loop (asyncio.AbstractEventLoop): The running event loop to submit work to.
         """
         self.vector_store = vector_store
         self.document_processor = document_processor
-        self.is_processing = False
-        self.cooldown_period = 2  # seconds
+        self.loop = loop
+        # path -> (latest event type, monotonic time of that event); only touched on the loop thread.
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._debounce_delay = config.PROCESSING_DELAY_MS / 1000
+        # Set by close(); run() returns after its current flush instead of being cancelled mid-batch.
+        self._closing = False
 
     def on_created(self, event: FileSystemEvent) -> None:
         """
@@ -65,39 +99,150 @@ class DocumentEventHandler(FileSystemEventHandler):
         if not event.is_directory:
             self._handle_event(event.src_path, "deleted")
 
+    def on_moved(self, event: FileSystemEvent) -> None:
+        """
+        Handles file move and rename events.
+
+        A move is recorded as a deletion of the source and a creation of the
+        destination; process_changes recognizes the pair as a rename.
+
+        Args:
+            event (FileSystemEvent): The event object for the moved file.
+        """
+        if not event.is_directory:
+            self._handle_event(event.src_path, "deleted")
+            self._handle_event(event.dest_path, "created")
+
     def _handle_event(self, src_path: str, event_type: str) -> None:
         """
-        Generic event handler for processing file events.
+        Generic event handler for recording file events.
+
+        Runs on the watchdog thread and only hands the event over to the event
+        loop, so the dispatcher is never blocked by document processing.
 
         Args:
             src_path (str): The path to the file that triggered the event.
             event_type (str): The type of event (e.g., "created", "modified", "deleted").
         """
-        if self.is_processing:
-            logger.warning(f"Skipping event {event_type} for {src_path}, already processing.")
+        if not is_watched_file(src_path):
             return
 
-        self.is_processing = True
-        try:
-            file_path = Path(src_path)
-            if file_path.suffix.lower() not in config.SUPPORTED_EXTENSIONS:
-                return
+        self.loop.call_soon_threadsafe(
+            self._pending.__setitem__, src_path, (event_type, time.monotonic())
+        )
 
-            logger.info(f"File {event_type}: {file_path}")
-            if event_type == "created" or event_type == "modified":
-                # The document processor handles adding/updating and marking state
-                asyncio.run(self.document_processor.process_file_batch([str(file_path)]))
+    async def run(self) -> None:
+        """
+        Periodically flushes debounced events until close() is called.
+        """
+        while not self._closing:
+            await asyncio.sleep(self._debounce_delay)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush file events: {e}", exc_info=True)
+
+    def close(self) -> None:
+        """
+        Asks run() to return once its current flush is done.
+        """
+        self._closing = True
+
+    async def flush(self, force: bool = False) -> None:
+        """
+        Processes all pending events that have been quiet for the debounce delay.
 
-            elif event_type == "deleted":
+        Args:
+            force (bool): If True, processes every pending event regardless of its age.
+        """
+        now = time.monotonic()
+        ready = {
+            path: event_type
+            for path, (event_type, timestamp) in self._pending.items()
+            if force or now - timestamp >= self._debounce_delay
+        }
+        if not ready:
+            return
+        # Pop before awaiting so events arriving during processing are queued again.
+        for path in ready:
+            del self._pending[path]
+
+        deleted = [path for path, event_type in ready.items() if event_type == "deleted"]
+        changed = [path for path, event_type in ready.items() if event_type != "deleted"]
+        await self.process_changes(changed, deleted)
+
+    async def process_changes(self, changed: List[str], deleted: List[str]) -> None:
+        """
+        Applies a group of already-debounced file changes.
+
+        Args:
+            changed (List[str]): Paths of created or modified files.
+            deleted (List[str]): Paths of deleted files.
+        """
+        # The processor's lock serializes flushes with each other and with a /process reprocess.
+        async with self.document_processor.processing_lock:
+            state_manager = self.document_processor.state_manager
+            for old_path, new_path in self._match_renames(changed, deleted).items():
+                logger.info(f"File renamed: {old_path} -> {new_path}")
+                # Identical content: move the stored chunks instead of re-embedding them
+                if await self.vector_store.rename_source(old_path, new_path):
+                    state_manager.rename_file_in_state(old_path, new_path)
+                    deleted = [path for path in deleted if path != old_path]
+                    changed = [path for path in changed if path != new_path]
+
+            for file_path in deleted:
+                logger.info(f"File deleted: {file_path}")
                 # For deletion, we need to remove from vector store and state manager
-                asyncio.run(self.vector_store.remove_document(str(file_path)))
-                self.document_processor.state_manager.remove_file_from_state(str(file_path))
+                await self.vector_store.remove_document(file_path)
+                self.document_processor.state_manager.remove_file_from_state(file_path)
+
+            for i in range(0, len(changed), config.BATCH_SIZE):
+                batch = changed[i:i + config.BATCH_SIZE]
+                logger.info(f"Files changed: {batch}")
+                # The document processor handles adding/updating and marking state
+                await self.document_processor.process_file_batch(batch)
+
+            await state_manager.save_state()
 
-        except Exception as e:
-            logger.error(f"Failed to handle {event_type} for {src_path}: {e}", exc_info=True)
-        finally:
-            time.sleep(self.cooldown_period)
-            self.is_processing = False
+    def _match_renames(self, changed: List[str], deleted: List[str]) -> Dict[str, str]:
+        """
+        Pairs deleted files with new files that have the same extension and content.
+
+        Only new files whose mtime and size match a deleted file's signature
+        are hashed, so unrelated changes cost a single stat each.
+
+        Args:
+            changed (List[str]): Paths of created or modified files.
+            deleted (List[str]): Paths of deleted files.
+
+        Returns:
+            Dict[str, str]: Old path -> new path for every detected rename.
+        """
+        state_manager = self.document_processor.state_manager
+        deleted_by_signature = {
+            state_manager.known_files[path]: path for path in deleted if path in state_manager.known_files
+        }
+        if not deleted_by_signature:
+            return {}
+        # Signatures are "{mtime}_{size}_{hash}"
+        stat_prefixes = {signature.rsplit("_", 1)[0] for signature in deleted_by_signature}
+
+        renames = {}
+        for path in changed:
+            if path in state_manager.known_files:
+                continue
+            try:
+                stat = os.stat(path)
+                if f"{stat.st_mtime}_{stat.st_size}" not in stat_prefixes:
+                    continue
+                signature = state_manager.get_content_signature(path, stat)
+            except OSError:
+                continue
+            old_path = deleted_by_signature.get(signature)
+            if old_path and os.path.splitext(old_path)[1].lower() == os.path.splitext(path)[1].lower():
+                renames[old_path] = path
+                del deleted_by_signature[signature]
+        return renames
 
 
 def process_existing_documents(vector_store: VectorStore, document_processor: DocumentProcessor) -> None:
@@ -132,14 +277,16 @@ class FileWatcher:
     """
     Monitors a directory for file changes and triggers document processing.
 
-    This class sets up a watchdog observer to watch for file creation,
-    modification, and deletion events in the specified directory. It uses
-    a DocumentEventHandler to dispatch events to the appropriate handlers.
+    When the `watchfiles` backend is selected and installed, changes are read
+    from its native (inotify/FSEvents) watcher, which already debounces them
+    in Rust. Otherwise a watchdog observer is used and events are debounced by
+    the DocumentEventHandler. Both backends dispatch through the handler.
 
     Attributes:
         vector_store (VectorStore): An instance of the vector store for database operations.
         document_processor (DocumentProcessor): An instance of the document processor for handling files.
         observer (Observer): The watchdog observer instance that monitors the file system.
+        loop (asyncio.AbstractEventLoop): The main event loop, captured when the watcher starts.
     """
 
     def __init__(self, vector_store: VectorStore, document_processor: DocumentProcessor):
@@ -161,20 +308,79 @@ class FileWatcher:
         self.vector_store = vector_store
         self.document_processor = document_processor
         self.observer = Observer()
+        self.loop = None
+        self.event_handler = None
+        self._debounce_task = None
+        self._watch_task = None
+        self._stop_event = None
 
     def start(self) -> None:
         """
         Starts the file watcher.
+
+        Must be called from the main event loop, which is captured and used
+        to run all document processing triggered by file events.
         """
-        event_handler = DocumentEventHandler(self.vector_store, self.document_processor)
-        self.observer.schedule(event_handler, config.WATCH_DIRECTORY, recursive=config.RECURSIVE_WATCH)
-        self.observer.start()
+        self.loop = asyncio.get_running_loop()
+        self.event_handler = DocumentEventHandler(self.vector_store, self.document_processor, self.loop)
+
+        if config.WATCH_BACKEND == "watchfiles" and awatch is not None:
+            self._stop_event = asyncio.Event()
+            self._watch_task = self.loop.create_task(self._watch_with_watchfiles())
+        else:
+            if config.WATCH_BACKEND == "watchfiles":
+                logger.warning("watchfiles is not installed, falling back to watchdog.")
+            self._debounce_task = self.loop.create_task(self.event_handler.run())
+            self.observer.schedule(self.event_handler, config.WATCH_DIRECTORY, recursive=config.RECURSIVE_WATCH)
+            self.observer.start()
         logger.info(f"Started watching directory: {config.WATCH_DIRECTORY}")
 
-    def stop(self) -> None:
+    async def _watch_with_watchfiles(self) -> None:
+        """
+        Consumes batches of changes from watchfiles until the watcher is stopped.
+        """
+        async for changes in awatch(
+            config.WATCH_DIRECTORY,
+            step=config.PROCESSING_DELAY_MS,
+            recursive=config.RECURSIVE_WATCH,
+            stop_event=self._stop_event,
+            watch_filter=lambda _change, path: is_watched_file(path),
+        ):
+            changed, deleted = set(), set()
+            for _change, path in changes:
+                # A batch may hold several changes for one path; the disk decides.
+                if os.path.exists(path):
+                    changed.add(path)
+                else:
+                    deleted.add(path)
+            if not changed and not deleted:
+                continue
+            try:
+                await self.event_handler.process_changes(sorted(changed), sorted(deleted))
+            except Exception as e:
+                logger.error(f"Failed to process file changes: {e}", exc_info=True)
+
+    async def stop(self) -> None:
         """
-        Stops the file watcher.
+        Stops the file watcher once the changes it has seen are processed.
+
+        Batches already being processed are allowed to finish, and events still
+        waiting out the debounce delay are flushed, so no change is lost.
         """
-        self.observer.stop()
-        self.observer.join()
+        if self._stop_event:
+            # awatch returns after the batch in progress; the task then ends by itself
+            self._stop_event.set()
+        if self.observer.is_alive():
+            self.observer.stop()
+            await asyncio.to_thread(self.observer.join)
+        if self.event_handler:
+            self.event_handler.close()
+        tasks = [task for task in (self._watch_task, self._debounce_task) if task]
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"File watcher task failed: {result}")
+        if self.event_handler:
+            # Events the observer handed over while stopping, and paths still inside the debounce delay
+            await asyncio.sleep(0)
+            await self.event_handler.flush(force=True)
         logger.info("Stopped watching directory.")
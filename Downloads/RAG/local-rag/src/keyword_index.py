@@ -0,0 +1,94 @@
+"""
+Keyword (BM25) index over chunk text, stored next to the vector collection
+Complements semantic search with exact term matches
+"""
+import json
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+
+class KeywordIndex:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._db = None
+        # Writes and searches both run in worker threads and share one connection; sqlite3
+        # connections are not safe to use from several threads at once
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Open the index database, creating the tables on first use"""
+        self._db = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        # Makes INSERT OR REPLACE fire the delete trigger for the replaced row
+        self._db.execute("PRAGMA recursive_triggers=ON")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY, source TEXT NOT NULL, content TEXT NOT NULL, metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source);
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                content, content='chunks', content_rowid='rowid'
+            );
+            CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts(rowid, content) VALUES (new.rowid, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+            END;
+        """)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM chunks").fetchone()[0]
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict]):
+        """Index chunks; each metadata must carry its 'source'"""
+        rows = [
+            (chunk_id, metadata['source'], document, json.dumps(metadata))
+            for chunk_id, document, metadata in zip(ids, documents, metadatas)
+        ]
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (id, source, content, metadata) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def remove_source(self, source: str):
+        """Drop every chunk of a document"""
+        self.remove_sources([source])
+
+    def remove_sources(self, sources: List[str]):
+        """Drop every chunk of several documents"""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM chunks WHERE source = ?", [(source,) for source in sources])
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, Dict]]:
+        """Best BM25 matches as (chunk id, result) pairs; a chunk matches any query term"""
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+        # Quoted terms keep FTS5 operators and punctuation in the query from being parsed
+        match = " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT chunks.id, chunks.content, chunks.metadata, bm25(chunks_fts)
+                FROM chunks_fts JOIN chunks ON chunks.rowid = chunks_fts.rowid
+                WHERE chunks_fts MATCH ?
+                ORDER BY bm25(chunks_fts)
+                LIMIT ?
+                """,
+                (match, limit),
+            ).fetchall()
+        return [
+            (chunk_id, {'content': content, 'metadata': json.loads(metadata), 'score': -rank})
+            for chunk_id, content, metadata, rank in rows
+        ]
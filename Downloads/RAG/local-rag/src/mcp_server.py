@@ -4,27 +4,120 @@ CRITICAL: Real-time system status and performance monitoring
 """
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import time
-import psutil
 import os
 from loguru import logger
 from datetime import datetime
+from typing import Dict, List
 
 from src.vector_store import VectorStore
-from src.state_manager import StateManager
+from src.state_manager import StateManager, scan_files
 from src.models import SearchRequest, SearchResponse, SystemStatus, MCPRequest, MCPResponse
 from src import config
 
 class MCPServer:
-    def __init__(self, vector_store: VectorStore, state_manager: StateManager):
-        self.app = FastAPI(title="Local RAG System V2")
+    def __init__(self, vector_store: VectorStore, state_manager: StateManager, document_processor=None):
+        # orjson serializes the search results several times faster than the stdlib encoder
+        self.app = FastAPI(title="Local RAG System V2", default_response_class=ORJSONResponse)
         self.vector_store = vector_store
         self.state_manager = state_manager
+        # Optional: lets /process re-run ingestion in place instead of asking for a restart
+        self.document_processor = document_processor
+        self._reprocess_task = None
         self.start_time = time.time()
+        # (monotonic time, state last_processed_time, storage_mb) of the last data/ scan
+        self._storage_cache = None
+        # Micro-batching of /search; started on the first search, on that request's loop
+        self._search_queue = None
+        self._search_batcher = None
         self.setup_routes()
         self.setup_middleware()
         
+    async def _storage_used_mb(self, last_processed) -> float:
+        """Size of the data directory, rescanned only after the TTL or a state change"""
+        now = time.monotonic()
+        cache = self._storage_cache
+        if (cache and now - cache[0] < config.STORAGE_CACHE_TTL_SEC
+                and cache[1] == last_processed):
+            return cache[2]
+        # Walking the tree is blocking I/O proportional to the corpus, keep it off the loop
+        storage_mb = await asyncio.to_thread(self._scan_storage_mb)
+        self._storage_cache = (now, last_processed, storage_mb)
+        return storage_mb
+        
+    @staticmethod
+    def _scan_storage_mb() -> float:
+        """Check file system storage used by the data directory"""
+        if not os.path.isdir("data"):
+            return 0.0
+        return sum(entry.stat().st_size for entry in scan_files("data")) / 1024 / 1024
+        
+    async def _reprocess(self):
+        """Forget every file's signature and ingest them all again"""
+        # Waits for the file watcher to finish its current pass, and holds it off meanwhile
+        async with self.document_processor.processing_lock:
+            # Every file now looks new
+            self.state_manager.reset_state()
+            await self.document_processor.process_changed_files_only()
+            
+    async def stop_reprocess(self) -> bool:
+        """Cancel a running reprocess; returns True if one was cut short"""
+        task = self._reprocess_task
+        if task is None or task.done():
+            return False
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return True
+            
+    @staticmethod
+    def _log_reprocess_failure(task: asyncio.Task):
+        """Report an exception of the background reprocess; nothing else awaits the task"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.opt(exception=task.exception()).error(f"Reprocessing failed: {task.exception()}")
+        
+    async def _batched_search(self, query: str, limit: int) -> List[Dict]:
+        """Queue a query for the next search batch and wait for its results"""
+        loop = asyncio.get_running_loop()
+        if (self._search_batcher is None or self._search_batcher.done()
+                or self._search_batcher.get_loop() is not loop):
+            self._search_queue = asyncio.Queue()
+            self._search_batcher = loop.create_task(self._run_search_batches(self._search_queue))
+        future = loop.create_future()
+        self._search_queue.put_nowait((query, limit, future))
+        return await future
+        
+    async def _run_search_batches(self, queue: asyncio.Queue):
+        """Collect queued queries into batches and answer each batch with one search"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + config.SEARCH_BATCH_WAIT_MS / 1000
+            while len(batch) < config.SEARCH_BATCH_SIZE:
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Skip queries whose request went away while they were queued
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                continue
+            try:
+                results = await self.vector_store.search_many(
+                    [query for query, _, _ in batch],
+                    limits=[limit for _, limit, _ in batch]
+                )
+                for (_, _, future), query_results in zip(batch, results):
+                    if not future.done():
+                        future.set_result(query_results)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+        
     def setup_middleware(self):
         """Setup CORS and other middleware"""
         self.app.add_middleware(
@@ -44,22 +137,13 @@ class MCPServer:
             try:
                 # Get the number of processed files from the StateManager
                 total_files_processed = len(self.state_manager.known_files)
-                
-                # Check system resources
-                process = psutil.Process(os.getpid())
-                memory_mb = process.memory_info().rss / 1024 / 1024
-                
-                # Check file system storage used by the data directory
-                storage_mb = sum(
-                    os.path.getsize(os.path.join(dirpath, filename))
-                    for dirpath, _, filenames in os.walk("data")
-                    for filename in filenames
-                ) / 1024 / 1024
+                last_processed = self.state_manager.last_processed_time
+                storage_mb = await self._storage_used_mb(last_processed)
                 
                 return SystemStatus(
                     status="healthy",
                     total_documents=total_files_processed,
-                    last_processed=self.state_manager.last_processed_time,
+                    last_processed=last_processed,
                     services_running=["file_watcher", "vector_store", "mcp_server"],
                     uptime_seconds=time.time() - self.start_time,
                     storage_used_mb=round(storage_mb, 2)
@@ -75,18 +159,18 @@ class MCPServer:
             start_time_req = time.time()
             
             try:
-                results = await self.vector_store.search(
-                    query=request.query,
-                    limit=request.limit
-                )
+                results = await self._batched_search(request.query, request.limit)
                 
                 query_time_ms = (time.time() - start_time_req) * 1000
                 
-                return SearchResponse(
+                response = SearchResponse(
                     results=results,
                     total_found=len(results),
                     query_time_ms=query_time_ms
                 )
+                # Validated once above; pydantic writes the JSON itself, so FastAPI's
+                # dump/re-validate/encode pass over every result is skipped
+                return Response(content=response.model_dump_json(), media_type="application/json")
                 
             except Exception as e:
                 logger.error(f"Search failed: {e}")
@@ -196,17 +280,21 @@ class MCPServer:
                 logger.error(f"An unexpected error occurred during verified deletion of {file_path}: {e}", exc_info=True)
                 raise HTTPException(status_code=500, detail="An internal error occurred during deletion.")
         
-        @self.app.post("/process")
+        @self.app.post("/process", status_code=202)
         async def force_reprocess():
             """Force reprocess all documents (for admin use)"""
             try:
-                # This is a simplified approach. A real implementation might
-                # trigger a re-processing event for the StartupManager.
-                signatures_file = "data/processed/signatures.json"
-                if os.path.exists(signatures_file):
-                    os.remove(signatures_file)
-                
-                return {"message": "Reprocessing initiated - restart system to take effect"}
+                if self._reprocess_task and not self._reprocess_task.done():
+                    return {"message": "Reprocessing already in progress"}
+                    
+                if self.document_processor is None:
+                    self.state_manager.reset_state()
+                    return {"message": "Reprocessing initiated - restart system to take effect"}
+                    
+                # Re-ingest in the background and answer right away
+                self._reprocess_task = asyncio.create_task(self._reprocess())
+                self._reprocess_task.add_done_callback(self._log_reprocess_failure)
+                return {"message": "Reprocessing started"}
             except Exception as e:
                 logger.error(f"Failed to initiate reprocessing: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
@@ -247,7 +335,12 @@ class MCPServer:
             app=self.app,
             host="0.0.0.0",
             port=8000,
+            # uvicorn parses HTTP with httptools when it is installed (see requirements.txt), else h11
             log_level="info"
         )
         server = uvicorn.Server(config)
-        await server.serve()
+        try:
+            await server.serve()
+        finally:
+            if self._search_batcher:
+                self._search_batcher.cancel()
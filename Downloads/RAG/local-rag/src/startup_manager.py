@@ -19,7 +19,7 @@ class StartupManager:
         # Pass managers to processor
         self.document_processor = DocumentProcessor(self.vector_store, self.state_manager)
         # Pass services to server
-        self.mcp_server = MCPServer(self.vector_store, self.state_manager)
+        self.mcp_server = MCPServer(self.vector_store, self.state_manager, self.document_processor)
         # Pass processor to watcher
         self.file_watcher = FileWatcher(self.vector_store, self.document_processor)
         
@@ -34,11 +34,15 @@ class StartupManager:
         logging.info("Phase 2: Initializing services (Vector Store)...")
         await self.vector_store.initialize()
 
-        logging.info("Phase 3: Syncing file state and cleaning up deleted files...")
-        await self.cleanup_deleted_files()
-        
-        logging.info("Phase 4: Processing new and changed files...")
-        await self.document_processor.process_changed_files_only()
+        if config.TRUST_CLEAN_SHUTDOWN and self.state_manager.clean_shutdown:
+            # The watcher kept the state current until the last clean shutdown
+            logging.info("Previous run shut down cleanly - skipping the startup scan (phases 3 and 4).")
+        else:
+            logging.info("Phase 3: Syncing file state and cleaning up deleted files...")
+            await self.cleanup_deleted_files()
+            
+            logging.info("Phase 4: Processing new and changed files...")
+            await self.document_processor.process_changed_files_only()
         
         logging.info("Phase 5: Starting background services (MCP Server and File Watcher)...")
         await self.start_services()
@@ -66,20 +70,33 @@ class StartupManager:
         mcp_task = asyncio.create_task(self.mcp_server.start())
         self.tasks.append(mcp_task)
         
-        # The file_watcher.start() method is blocking, so it also needs to be run in a task.
-        watcher_task = asyncio.create_task(asyncio.to_thread(self.file_watcher.start))
-        self.tasks.append(watcher_task)
-        
+        # The file_watcher.start() method only launches the observer thread; it is
+        # called on the loop so the watcher can hand events back to this loop.
+        self.file_watcher.start()
 
     async def shutdown(self):
         """Gracefully shutdown the system."""
         logging.info("Shutting down services...")
+        # The state may only be marked clean once every seen change is applied,
+        # or a TRUST_CLEAN_SHUTDOWN start would skip the scan that picks them up
+        clean = True
+        # First, so the watcher's final flush does not wait for a whole reprocess to finish
+        if await self.mcp_server.stop_reprocess():
+            # Reset state with part of the corpus re-ingested: the next start must scan
+            clean = False
         if self.file_watcher:
-            self.file_watcher.stop()
+            try:
+                # Finishes the batch in progress and flushes debounced changes
+                await self.file_watcher.stop()
+            except Exception as e:
+                logging.error(f"File watcher did not stop cleanly: {e}", exc_info=True)
+                clean = False
         
         for task in self.tasks:
             if not task.done():
                 task.cancel()
         
         await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.document_processor.shutdown()
+        self.state_manager.close(clean=clean)
         logging.info("All services have been shut down.")
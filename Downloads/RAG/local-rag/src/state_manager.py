@@ -6,37 +6,128 @@ CRITICAL: This prevents reprocessing unchanged files
 import json
 import os
 import logging
+import sqlite3
+import threading
 from pathlib import Path
-from typing import Dict, Set, Optional
+from typing import Dict, Iterator, Set, Optional
 from datetime import datetime
 from src import config
 
+try:
+    from blake3 import blake3 as _content_hash
+except ImportError:  # blake3 is optional; SHA-256 gives the same change detection, only slower
+    from hashlib import sha256 as _content_hash
+
+# Bytes hashed per read when fingerprinting a small file
+HASH_READ_BYTES = 1 << 20
+# Signatures are computed in worker threads; each keeps one reusable read buffer
+_hash_buffers = threading.local()
+
+def _hash_buffer() -> memoryview:
+    buffer = getattr(_hash_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _hash_buffers.buffer = memoryview(bytearray(HASH_READ_BYTES))
+    return buffer
+
+def scan_files(directory: str) -> Iterator[os.DirEntry]:
+    """Recursively yield every file under directory; entries carry the stat info of the directory read"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan_files(entry.path)
+            elif entry.is_file():
+                yield entry
+
+
 class StateManager:
     def __init__(self):
+        self.state_db = config.PROCESSED_DIR / "state.db"
+        # Pre-SQLite state file; imported once on first load, then set aside
         self.signatures_file = config.PROCESSED_DIR / "signatures.json"
         self.processing_log = config.PROCESSED_DIR / "processing.log"
         self.known_files: Dict[str, str] = {}  # file_path -> content_signature
         self.last_processed_time: Optional[datetime] = None
+        # Whether the previous run closed the state cleanly (set by load_existing_state)
+        self.clean_shutdown = False
+        self._db: Optional[sqlite3.Connection] = None
+        self._log_file = None
+        
+    def _connection(self) -> sqlite3.Connection:
+        """Open the state database on first use"""
+        if self._db is None:
+            config.PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+            # Autocommit + WAL: each change is a small append, never a full rewrite
+            self._db = sqlite3.connect(self.state_db, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, signature TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        return self._db
         
     async def load_existing_state(self):
         """Load known files and their signatures from previous runs"""
         
-        # Ensure processed directory exists
-        config.PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+        db = self._connection()
+        self.known_files = dict(db.execute("SELECT path, signature FROM files"))
         
-        # Load known file signatures
-        if os.path.exists(self.signatures_file):
-            with open(self.signatures_file, 'r') as f:
-                self.known_files = json.load(f)
+        if not self.known_files and os.path.exists(self.signatures_file):
+            self._import_legacy_signatures()
+            
+        # Cleared while running and set again by close(); a crash leaves it cleared
+        row = db.execute("SELECT value FROM meta WHERE key = 'clean_shutdown'").fetchone()
+        self.clean_shutdown = row is not None and row[0] == '1'
+        self._set_clean_shutdown(False)
+            
+        if self.known_files:
             logging.info(f"Loaded {len(self.known_files)} known files from cache")
         else:
-            self.known_files = {}
             logging.info("No existing file cache found - will process all files")
             
+    def _import_legacy_signatures(self):
+        """Move signatures from the old JSON state file into the database"""
+        with open(self.signatures_file, 'r') as f:
+            self.known_files = json.load(f)
+        db = self._connection()
+        with db:
+            db.execute("BEGIN")
+            db.executemany(
+                "INSERT OR REPLACE INTO files (path, signature) VALUES (?, ?)",
+                self.known_files.items(),
+            )
+        os.replace(self.signatures_file, f"{self.signatures_file}.migrated")
+        logging.info(f"Imported {len(self.known_files)} file signatures from {self.signatures_file}")
+            
     async def save_state(self):
-        """Persist current state to disk"""
-        with open(self.signatures_file, 'w') as f:
-            json.dump(self.known_files, f, indent=2)
+        """Persist current state to disk (signatures are already written through; this checkpoints the WAL and flushes the log)"""
+        if self._db is not None:
+            self._db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        if self._log_file is not None:
+            self._log_file.flush()
+            
+    def reset_state(self):
+        """Forget every processed file so the next startup reprocesses the whole corpus"""
+        self._connection().execute("DELETE FROM files")
+        self.known_files.clear()
+        
+    def close(self, clean: bool = True):
+        """
+        Close the state database and the processing log, recording whether the shutdown was clean.
+        Pass clean=False when changes may have gone unprocessed, so the next start scans again.
+        """
+        if self._db is not None:
+            self._set_clean_shutdown(clean)
+            self._db.close()
+            self._db = None
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+            
+    def _set_clean_shutdown(self, clean: bool):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('clean_shutdown', ?)", ('1' if clean else '0',)
+        )
             
     def is_file_changed(self, file_path: str, current_signature: str) -> bool:
         """Check if file has changed since last processing"""
@@ -48,32 +139,43 @@ class StateManager:
         """Mark file as processed with its signature"""
         self.known_files[file_path] = signature
         self.last_processed_time = datetime.now()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO files (path, signature) VALUES (?, ?)", (file_path, signature)
+        )
         
         # Log processing event
-        with open(self.processing_log, 'a') as f:
-            f.write(f"{self.last_processed_time.isoformat()} - Processed: {file_path}\n")
+        # One buffered handle for the whole run; flushed by save_state and close
+        if self._log_file is None:
+            self._log_file = open(self.processing_log, 'a', buffering=65536)
+        self._log_file.write(f"{self.last_processed_time.isoformat()} - Processed: {file_path}\n")
             
     def remove_file_from_state(self, file_path: str):
         """Remove a file from the state cache"""
         if file_path in self.known_files:
             del self.known_files[file_path]
             self.last_processed_time = datetime.now()
+            self._connection().execute("DELETE FROM files WHERE path = ?", (file_path,))
             logging.info(f"Removed {file_path} from state cache.")
             
+    def rename_file_in_state(self, old_path: str, new_path: str):
+        """Move a file's signature to its new path (content unchanged)"""
+        if old_path in self.known_files:
+            self.known_files[new_path] = self.known_files.pop(old_path)
+            self.last_processed_time = datetime.now()
+            self._connection().execute(
+                "UPDATE OR REPLACE files SET path = ? WHERE path = ?", (new_path, old_path)
+            )
+            
     def get_files_to_process(self, documents_dir: str) -> Set[str]:
         """Return only files that need processing"""
         files_to_process = set()
         
-        for root, dirs, files in os.walk(documents_dir):
-            for file in files:
-                if file.startswith('.'):
-                    continue
-                    
-                file_path = os.path.join(root, file)
-                current_sig = self.get_content_signature(file_path)
-                
-                if self.is_file_changed(file_path, current_sig):
-                    files_to_process.add(file_path)
+        for entry in self._iter_files(documents_dir):
+            known_sig = self.known_files.get(entry.path)
+            # Signatures start with mtime and size, so a matching prefix means the
+            # file is unchanged and a mismatch means it changed - no hashing needed.
+            if known_sig is None or not known_sig.startswith(self._fast_signature(entry)):
+                files_to_process.add(entry.path)
                     
         return files_to_process
         
@@ -83,39 +185,56 @@ class StateManager:
         CRITICAL: This keeps the DB in sync with the file system.
         """
         cached_files = set(self.known_files.keys())
-        
-        current_files = set()
-        for root, _, files in os.walk(documents_dir):
-            for file in files:
-                if file.startswith('.'):
-                    continue
-                current_files.add(os.path.join(root, file))
+        current_files = {entry.path for entry in self._iter_files(documents_dir)}
                 
         deleted_files = cached_files - current_files
         return deleted_files
         
-    def get_content_signature(self, file_path: str) -> str:
+    def _iter_files(self, directory: str) -> Iterator[os.DirEntry]:
+        """Recursively yield non-hidden supported files"""
+        for entry in scan_files(directory):
+            if (not entry.name.startswith('.')
+                    and entry.name.lower().endswith(config.SUPPORTED_EXTENSIONS_TUPLE)):
+                yield entry
+                    
+    @staticmethod
+    def _fast_signature(entry: os.DirEntry) -> str:
+        """The mtime/size prefix of get_content_signature, taken from the directory entry"""
+        stat = entry.stat()
+        return f"{stat.st_mtime}_{stat.st_size}_"
+        
+    def get_content_signature(self, file_path: str, stat: Optional[os.stat_result] = None) -> str:
         """
         HYBRID APPROACH: Fast and reliable content change detection
         - Small files (<1MB): Full content hash
         - Large files: mtime + size + partial hash (first/last 64KB)
+        Only called for files whose mtime/size prefix changed (see get_files_to_process).
+        Pass stat when the caller already has it to skip a second stat call.
         """
-        import hashlib
-        
-        stat = os.stat(file_path)
+        if stat is None:
+            stat = os.stat(file_path)
         mtime = stat.st_mtime
         size = stat.st_size
         
-        if size < 1024 * 1024:  # Small files: full hash
-            with open(file_path, 'rb') as f:
-                content_hash = hashlib.sha256(f.read()).hexdigest()
-        else:  # Large files: partial hash
-            with open(file_path, 'rb') as f:
-                # Hash first 64KB
-                first_chunk = f.read(65536)
-                # Hash last 64KB
+        # Same mtime and size as when it was processed: reuse that signature, don't hash
+        known_sig = self.known_files.get(file_path)
+        if known_sig is not None and known_sig.startswith(f"{mtime}_{size}_"):
+            return known_sig
+            
+        hasher = _content_hash()
+        buffer = _hash_buffer()
+        # Unbuffered: readinto fills our buffer directly, with no intermediate bytes objects
+        with open(file_path, 'rb', buffering=0) as f:
+            if size < 1024 * 1024:  # Small files: full hash
+                while n := f.readinto(buffer):
+                    hasher.update(buffer[:n])
+            else:  # Large files: partial hash
+                # First 64KB
+                head = f.readinto(buffer[:65536])
+                # Last 64KB, right behind it, so both are hashed in one call
                 f.seek(-65536, 2)
-                last_chunk = f.read(65536)
-                content_hash = hashlib.sha256(first_chunk + last_chunk).hexdigest()
+                tail = f.readinto(buffer[head:head + 65536])
+                hasher.update(buffer[:head + tail])
+        content_hash = hasher.hexdigest()
         
         return f"{mtime}_{size}_{content_hash}"
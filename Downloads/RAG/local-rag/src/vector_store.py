@@ -3,22 +3,85 @@ V2: Proper state persistence and fast startup
 CRITICAL: Load existing data instead of rebuilding everything
 """
 import os
+import asyncio
 import logging
+import functools
+import threading
+from collections import OrderedDict
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from src import config
+from src.keyword_index import KeywordIndex
 from pathlib import Path
 
+@functools.lru_cache(maxsize=4096)
+def normalize_path(file_path: str) -> str:
+    """Absolute, symlink-free form of a path, as stored in chunk metadata (cached: resolving stats the path)"""
+    return str(Path(file_path).resolve())
+
+
+def create_embedding_function():
+    """The sentence-transformers embedding function used for chunks and queries (loads the model)"""
+    from chromadb.utils import embedding_functions
+    return embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+
+
+class _LRUCache(OrderedDict):
+    """Small least-recently-used mapping"""
+    
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+        
+    def lookup(self, key):
+        value = self.get(key)
+        if value is not None:
+            self.move_to_end(key)
+        return value
+        
+    def store(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        if len(self) > self.max_size:
+            self.popitem(last=False)
+
+
 class VectorStore:
-    def __init__(self, persist_directory: str = None):
+    def __init__(self, persist_directory: str = None, collection_name: str = "rag_documents",
+                 embedding_function=None):
         self.persist_directory = persist_directory or str(config.VECTOR_STORE_PATH)
         self.client = None
         self.collection = None
-        self.collection_name = "rag_documents"
+        self.collection_name = collection_name
+        # Created on initialize unless one is passed in (lets tests share a loaded model)
+        self.embedding_function = embedding_function
+        self.keyword_index = None
+        # Query text -> embedding; embeddings never go stale
+        self._query_embeddings = _LRUCache(config.QUERY_CACHE_SIZE)
+        # (generation, query, limit) -> results; the generation moves on every write
+        self._search_results = _LRUCache(config.QUERY_CACHE_SIZE)
+        self._generation = 0
+        # Chunks in the collection, kept current by the writes so stats never scan Chroma
+        self._chunk_count = 0
+        # Writes run in worker threads and may overlap (watcher, /process); each one removes,
+        # adds and counts under this lock, so two writes of one file cannot both count its chunks
+        self._write_lock = threading.RLock()
+        # initialize() runs once, on the first call by startup or by any async method
+        self._ready = False
+        self._init_lock = asyncio.Lock()
         
     async def initialize(self):
-        """Initialize ChromaDB with persistence"""
+        """Initialize ChromaDB with persistence (idempotent; called on first use if not called up front)"""
+        if self._ready:
+            return
+        async with self._init_lock:
+            if not self._ready:
+                await self._open()
+                self._ready = True
+                
+    async def _open(self):
+        """Open the client, embedding model, collection and keyword index"""
         
         # Ensure directory exists
         os.makedirs(self.persist_directory, exist_ok=True)
@@ -32,92 +95,332 @@ class VectorStore:
             )
         )
         
+        # One embedding function shared by ingestion and queries
+        if self.embedding_function is None:
+            self.embedding_function = create_embedding_function()
+        
         # Get or create collection
         try:
-            self.collection = self.client.get_collection(self.collection_name)
+            self.collection = self.client.get_collection(
+                self.collection_name,
+                embedding_function=self.embedding_function
+            )
             existing_count = self.collection.count()
             logging.info(f"Loaded existing collection with {existing_count} documents")
             
         except Exception:
             # Collection doesn't exist, create new one
-            from chromadb.utils import embedding_functions
-            embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-                model_name="all-MiniLM-L6-v2"
-            )
             self.collection = self.client.create_collection(
                 name=self.collection_name,
-                embedding_function=embedding_function
+                embedding_function=self.embedding_function,
+                metadata={
+                    "hnsw:space": config.HNSW_SPACE,
+                    "hnsw:M": config.HNSW_M,
+                    "hnsw:construction_ef": config.HNSW_CONSTRUCTION_EF,
+                    "hnsw:search_ef": config.HNSW_SEARCH_EF,
+                    "hnsw:num_threads": os.cpu_count() or 1
+                }
             )
             logging.info("Created new document collection")
+        else:
+            self._apply_search_ef()
+            
+        self._chunk_count = self.collection.count()
+            
+        # BM25 index over the same chunks, for exact term matches
+        self.keyword_index = KeywordIndex(
+            os.path.join(self.persist_directory, f"{self.collection_name}_keywords.db")
+        )
+        self.keyword_index.open()
+        if self.keyword_index.count() == 0 and self._chunk_count > 0:
+            # Collections created before the keyword index existed
+            existing = self.collection.get(include=['documents', 'metadatas'])
+            self.keyword_index.add(existing['ids'], existing['documents'], existing['metadatas'])
+            logging.info(f"Built keyword index for {len(existing['ids'])} existing chunks")
+            
+    def _apply_search_ef(self):
+        """Bring an existing collection's query-time ef in line with config (the only HNSW setting that can change)"""
+        try:
+            hnsw = (self.collection.configuration or {}).get('hnsw') or {}
+            if hnsw.get('ef_search') != config.HNSW_SEARCH_EF:
+                self.collection.modify(configuration={"hnsw": {"ef_search": config.HNSW_SEARCH_EF}})
+                logging.info(f"Set collection search_ef to {config.HNSW_SEARCH_EF}")
+        except Exception as e:
+            logging.warning(f"Could not update collection search_ef: {e}")
             
     async def add_document_chunks(self, file_path: str, chunks: List[Dict]):
         """Add document chunks to vector store"""
         
-        normalized_path = str(Path(file_path).resolve())
+        if not chunks:
+            # Nothing to add, but stale chunks of the file must still go
+            await self.remove_document(file_path)
+            return
+            
+        for chunk in chunks:
+            chunk['metadata']['source'] = file_path
+        await self.add_chunks_bulk(chunks)
         
-        # Remove existing chunks for this file (for updates)
-        await self.remove_document(normalized_path)
+    async def add_chunks_bulk(self, chunks: List[Dict]):
+        """
+        Add chunks of any number of files with a single embedding pass.
+        Each chunk's metadata must carry its 'source' file path; existing
+        chunks of every file in the batch are replaced.
+        """
+        await self.initialize()
         
-        # Prepare data for ChromaDB
         documents = []
         metadatas = []
         ids = []
+        chunk_counts = {}
         
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{normalized_path}_{i}"
+        for chunk in chunks:
+            normalized_path = normalize_path(chunk['metadata']['source'])
+            
+            chunk_index = chunk_counts.get(normalized_path, 0)
+            chunk_counts[normalized_path] = chunk_index + 1
+            
             documents.append(chunk['content'])
             # Ensure the metadata also uses the normalized path
             metadata = chunk['metadata']
             metadata['source'] = normalized_path
             metadatas.append(metadata)
-            ids.append(chunk_id)
-        
-        # Add to collection
-        if documents:
-            self.collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
-            logging.info(f"Added {len(chunks)} chunks for {file_path}")
+            ids.append(f"{normalized_path}_{chunk_index}")
+        
+        if not documents:
+            return
+            
+        # Removing the old chunks, embedding and writing all block; one thread hop does them together
+        await asyncio.to_thread(self._replace_chunks, list(chunk_counts), documents, metadatas, ids)
+        self._invalidate_search_results()
+        logging.info(f"Added {len(ids)} chunks for {len(chunk_counts)} files")
+        
+    def _replace_chunks(self, normalized_paths: List[str], documents: List[str],
+                        metadatas: List[Dict], ids: List[str]):
+        """Swap the stored chunks of the given files for new ones (blocking)"""
+        
+        # Embed the whole batch at once so the model runs on full batches; only the
+        # collection writes below need the lock
+        embeddings = self.embedding_function(documents)
+        
+        with self._write_lock:
+            # Remove existing chunks for these files (for updates), one lookup for all of them
+            self._remove_sources(normalized_paths)
+            
+            # Chroma caps the size of a single write
+            step = self.client.get_max_batch_size()
+            try:
+                for start in range(0, len(ids), step):
+                    self.collection.add(
+                        documents=documents[start:start + step],
+                        embeddings=embeddings[start:start + step],
+                        metadatas=metadatas[start:start + step],
+                        ids=ids[start:start + step]
+                    )
+            except Exception:
+                # Some slices may have been written; take the count from the collection
+                self._recount_chunks()
+                raise
+            self._count_chunks(len(ids))
+            self.keyword_index.add(ids, documents, metadatas)
+        
+    def _count_chunks(self, delta: int):
+        with self._write_lock:
+            self._chunk_count += delta
+            
+    def _recount_chunks(self):
+        with self._write_lock:
+            self._chunk_count = self.collection.count()
         
     async def remove_document(self, file_path: str):
         """Remove all chunks for a specific document"""
+        await self.initialize()
         try:
-            normalized_path = str(Path(file_path).resolve())
-            # Query for existing chunks from this file
-            results = self.collection.get(
-                where={"source": normalized_path}
-            )
-            
-            if results and results['ids']:
-                self.collection.delete(ids=results['ids'])
-                logging.info(f"Removed {len(results['ids'])} existing chunks for {normalized_path}")
+            normalized_path = normalize_path(file_path)
+            removed = await asyncio.to_thread(self._remove_source, normalized_path)
+            if removed:
+                self._invalidate_search_results()
+                logging.info(f"Removed {removed} existing chunks for {normalized_path}")
                 
         except Exception as e:
             logging.warning(f"Could not remove existing chunks for {file_path}: {e}")
             
+    def _remove_source(self, normalized_path: str) -> int:
+        """Delete a document's chunks from the collection and keyword index (blocking); returns the count"""
+        return self._remove_sources([normalized_path])
+        
+    def _remove_sources(self, normalized_paths: List[str]) -> int:
+        """Delete the chunks of several documents (blocking); returns the count"""
+        with self._write_lock:
+            # Query for existing chunks from these files; only their ids are needed
+            results = self.collection.get(
+                where={"source": {"$in": normalized_paths}},
+                include=[]
+            )
+            if not results or not results['ids']:
+                return 0
+            self.collection.delete(ids=results['ids'])
+            self._count_chunks(-len(results['ids']))
+            self.keyword_index.remove_sources(normalized_paths)
+            return len(results['ids'])
+            
+    async def rename_source(self, old_path: str, new_path: str) -> bool:
+        """
+        Move a document's chunks to a new path, reusing their stored embeddings.
+        Returns False if nothing is stored for old_path.
+        """
+        await self.initialize()
+        old_normalized = normalize_path(old_path)
+        new_normalized = normalize_path(new_path)
+        moved = await asyncio.to_thread(self._move_source, old_normalized, new_normalized)
+        if not moved:
+            return False
+        self._invalidate_search_results()
+        logging.info(f"Moved {moved} chunks from {old_normalized} to {new_normalized}")
+        return True
+        
+    def _move_source(self, old_normalized: str, new_normalized: str) -> int:
+        """Re-store a document's chunks under a new path (blocking); returns the count"""
+        with self._write_lock:
+            results = self.collection.get(
+                where={"source": old_normalized},
+                include=['documents', 'metadatas', 'embeddings']
+            )
+            if not results or not results['ids']:
+                return 0
+                
+            # Chunk ids embed the path, so chunks are re-added under new ids, not updated in place
+            new_ids = [new_normalized + chunk_id[len(old_normalized):] for chunk_id in results['ids']]
+            for metadata in results['metadatas']:
+                metadata['source'] = new_normalized
+                
+            self._remove_source(new_normalized)
+            # The chunk count is unchanged unless the swap fails halfway
+            try:
+                self.collection.delete(ids=results['ids'])
+                self.collection.add(
+                    documents=results['documents'],
+                    embeddings=results['embeddings'],
+                    metadatas=results['metadatas'],
+                    ids=new_ids
+                )
+            except Exception:
+                self._recount_chunks()
+                raise
+            self.keyword_index.remove_source(old_normalized)
+            self.keyword_index.add(new_ids, results['documents'], results['metadatas'])
+            return len(new_ids)
+        
     async def search(self, query: str, limit: int = 10) -> List[Dict]:
         """Search documents by similarity"""
+        return (await self.search_many([query], limit))[0]
         
-        results = self.collection.query(
-            query_texts=[query],
+    async def search_many(self, queries: List[str], limit: int = 10,
+                          limits: Optional[List[int]] = None) -> List[List[Dict]]:
+        """
+        Search several queries at once, merging semantic and keyword matches.
+        limits gives each query its own result count (overriding limit); each query's
+        results are the same as when it is searched alone.
+        """
+        await self.initialize()
+        limits = limits or [limit] * len(queries)
+        
+        generation = self._generation
+        search_results = [
+            self._search_results.lookup((generation, query, query_limit))
+            for query, query_limit in zip(queries, limits)
+        ]
+        pending = [q for q, cached in enumerate(search_results) if cached is None]
+        if not pending:
+            return search_results
+        pending_queries = [queries[q] for q in pending]
+        pending_limits = [limits[q] for q in pending]
+        # One index query fetches enough for the largest request; every query's rankings
+        # are cut to its own limit before fusion, so a batch never reorders its results
+        fetch_limit = max(pending_limits)
+        
+        if config.HYBRID_SEARCH:
+            # Both backends run at the same time, so a query pays only for the slower one
+            vector_results, keyword_results = await asyncio.gather(
+                self.search_vector(pending_queries, fetch_limit),
+                self.search_keyword(pending_queries, fetch_limit)
+            )
+            merged = [
+                self._fuse_rankings([vector_ranking[:query_limit], keyword_ranking[:query_limit]], query_limit)
+                for vector_ranking, keyword_ranking, query_limit
+                in zip(vector_results, keyword_results, pending_limits)
+            ]
+        else:
+            vector_results = await self.search_vector(pending_queries, fetch_limit)
+            merged = [
+                [result for _, result in ranking[:query_limit]]
+                for ranking, query_limit in zip(vector_results, pending_limits)
+            ]
+            
+        for q, query_results in zip(pending, merged):
+            search_results[q] = query_results
+            self._search_results.store((generation, queries[q], limits[q]), query_results)
+            
+        return search_results
+        
+    async def search_vector(self, queries: List[str], limit: int) -> List[List[Tuple[str, Dict]]]:
+        """Semantic search with one embedding pass and one index query; (chunk id, result) pairs per query"""
+        
+        # Only texts never seen before go through the embedding model
+        new_texts = list(dict.fromkeys(
+            query for query in queries if self._query_embeddings.lookup(query) is None
+        ))
+        if new_texts:
+            # Runs in a thread so the event loop keeps accepting requests meanwhile
+            for text, embedding in zip(new_texts, await asyncio.to_thread(self.embedding_function, new_texts)):
+                self._query_embeddings.store(text, embedding)
+        query_embeddings = [self._query_embeddings[query] for query in queries]
+        
+        results = await asyncio.to_thread(
+            self.collection.query,
+            query_embeddings=query_embeddings,
             n_results=limit,
             include=['documents', 'metadatas', 'distances']
         )
         
-        # Format results
-        search_results = []
+        # Format results, one list per query
+        search_results = [[] for _ in queries]
         if results and results['documents']:
-            for i in range(len(results['documents'][0])):
-                search_results.append({
-                    'content': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'score': 1 - results['distances'][0][i]  # Convert distance to similarity
-                })
-            
+            for q, documents in enumerate(results['documents']):
+                for i in range(len(documents)):
+                    search_results[q].append((results['ids'][q][i], {
+                        'content': documents[i],
+                        'metadata': results['metadatas'][q][i],
+                        'score': 1 - results['distances'][q][i]  # Convert distance to similarity
+                    }))
         return search_results
         
+    async def search_keyword(self, queries: List[str], limit: int) -> List[List[Tuple[str, Dict]]]:
+        """BM25 keyword search; (chunk id, result) pairs per query"""
+        return await asyncio.to_thread(
+            lambda: [self.keyword_index.search(query, limit) for query in queries]
+        )
+        
+    @staticmethod
+    def _fuse_rankings(rankings: List[List[Tuple[str, Dict]]], limit: int) -> List[Dict]:
+        """
+        Reciprocal rank fusion of several rankings of the same chunks.
+        The score is scaled so a chunk ranked first by every backend gets 1.0.
+        """
+        scores = {}
+        results = {}
+        for ranking in rankings:
+            for rank, (chunk_id, result) in enumerate(ranking, start=1):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (config.RRF_K + rank)
+                results.setdefault(chunk_id, result)
+        best_score = len(rankings) / (config.RRF_K + 1)
+        ranked_ids = sorted(scores, key=scores.get, reverse=True)[:limit]
+        return [{**results[chunk_id], 'score': scores[chunk_id] / best_score} for chunk_id in ranked_ids]
+        
+    def _invalidate_search_results(self):
+        """Forget cached results after the collection changed"""
+        self._generation += 1
+        self._search_results.clear()
+        
     def get_collection_stats(self) -> Dict:
         """Get collection statistics"""
         if not self.collection:
@@ -127,7 +430,7 @@ class VectorStore:
                 'persist_directory': self.persist_directory
             }
         return {
-            'total_documents': self.collection.count(),
+            'total_documents': self._chunk_count,
             'collection_name': self.collection_name,
             'persist_directory': self.persist_directory
         }
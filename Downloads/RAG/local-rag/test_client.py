@@ -1,7 +1,14 @@
+import sys
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import orjson
 from pathlib import Path
 
+# One keep-alive session for every query instead of a new connection per call
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
 def execute_json_query(file_path: str):
     """
     Reads a JSON file and sends its content as a POST request to the MCP server.
@@ -18,15 +25,15 @@ def execute_json_query(file_path: str):
             print(f"Error: File not found at {file_path}")
             return
             
-        with open(query_path, 'r') as f:
-            payload = json.load(f)
+        # orjson parses straight from the file's bytes (its errors subclass json.JSONDecodeError)
+        payload = orjson.loads(query_path.read_bytes())
             
         print(f"Executing query from: {file_path}")
         print("Request Payload:")
         print(json.dumps(payload, indent=2))
         
         # Send the request
-        response = requests.post(url, json=payload)
+        response = _session.post(url, json=payload, timeout=(3, 30))
         response.raise_for_status()  # Raise an exception for bad status codes
         
         print("\nResponse received:")
@@ -49,5 +56,8 @@ if __name__ == "__main__":
     #
     # 2. In a *new* terminal, run this script:
     #    (local-rag\\venv\\Scripts\\python local-rag\\test_client.py)
+    #
+    # Several query files can be given as arguments; they share one connection.
 
-    execute_json_query("mcp_query.json")
+    for query_file in sys.argv[1:] or ["mcp_query.json"]:
+        execute_json_query(query_file)
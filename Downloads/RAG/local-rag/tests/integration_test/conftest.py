@@ -0,0 +1,82 @@
+import os
+import uuid
+import pytest
+from src import config
+from src.state_manager import StateManager
+from src.vector_store import VectorStore, create_embedding_function
+
+@pytest.fixture
+def isolated_config(tmp_path, monkeypatch):
+    """
+    Points the config's documents, processed-state and vector store directories
+    at fresh temporary folders; returns (docs_dir, processed_dir, vector_store_dir).
+    """
+    docs_dir = tmp_path / "documents"
+    processed_dir = tmp_path / "processed"
+    vector_store_dir = tmp_path / "vector_store"
+    for directory in (docs_dir, processed_dir, vector_store_dir):
+        directory.mkdir()
+
+    monkeypatch.setattr(config, 'DOCUMENTS_DIR', docs_dir)
+    monkeypatch.setattr(config, 'PROCESSED_DIR', processed_dir)
+    monkeypatch.setattr(config, 'VECTOR_STORE_PATH', vector_store_dir)
+
+    return docs_dir, processed_dir, vector_store_dir
+
+@pytest.fixture
+def seed_state(isolated_config):
+    """
+    Records files as processed by an earlier run: seed_state({file_path: signature}).
+    The state is written and closed like a real run's, before the code under test loads it.
+    """
+    def seed(signatures):
+        state_manager = StateManager()
+        for file_path, signature in signatures.items():
+            state_manager.mark_file_processed(file_path, signature)
+        state_manager.close()
+
+    return seed
+
+# Loading the embedding model and opening Chroma dominate the suite's run time,
+# so both happen once per session; each test gets its own fresh collection.
+
+@pytest.fixture(scope="session")
+def embedding_function():
+    """The embedding model, loaded once for the whole session."""
+    return create_embedding_function()
+
+@pytest.fixture(scope="session")
+def chroma_dir(tmp_path_factory):
+    """One Chroma database directory shared by every test's collection."""
+    return str(tmp_path_factory.mktemp("chroma"))
+
+@pytest.fixture
+def make_vector_store(chroma_dir, embedding_function):
+    """
+    A factory for VectorStore instances backed by the shared model, and by the
+    shared database unless a persist_directory is given (as StartupManager does).
+    Every store gets a uniquely named collection, dropped again after the test
+    together with its keyword index file.
+    """
+    stores = []
+
+    def make(persist_directory=None):
+        store = VectorStore(
+            persist_directory=persist_directory or chroma_dir,
+            collection_name=f"test_{uuid.uuid4().hex}",
+            embedding_function=embedding_function,
+        )
+        stores.append(store)
+        return store
+
+    yield make
+
+    for store in stores:
+        if store.keyword_index is not None:
+            store.keyword_index.close()
+        if store.client is not None:
+            store.client.delete_collection(store.collection_name)
+        keyword_db = os.path.join(store.persist_directory, f"{store.collection_name}_keywords.db")
+        for path in (keyword_db, keyword_db + "-wal", keyword_db + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
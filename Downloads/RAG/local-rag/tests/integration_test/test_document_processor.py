@@ -1,41 +1,25 @@
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-
 import pytest
-import os
 from pathlib import Path
-from src.document_processor import DocumentProcessor
+from src.document_processor import DocumentProcessor, FastTextSplitter, chunk_stream
 from src.state_manager import StateManager
-from src.vector_store import VectorStore
 from src import config
 
 @pytest.fixture
-def processor_with_real_dependencies(tmp_path, monkeypatch):
+def processor_with_real_dependencies(isolated_config, make_vector_store):
     """
     A fixture that sets up a full, isolated integration environment for the
     DocumentProcessor, including a real StateManager and a real VectorStore
     operating on temporary directories.
     """
-    # 1. Create temporary directories for all components
-    docs_dir = tmp_path / "documents"
-    docs_dir.mkdir()
-    processed_dir = tmp_path / "processed"
-    processed_dir.mkdir()
-    vector_store_dir = tmp_path / "vector_store"
-    vector_store_dir.mkdir()
-
-    # 2. Monkeypatch the config to use these temporary directories
-    monkeypatch.setattr(config, 'DOCUMENTS_DIR', docs_dir)
-    monkeypatch.setattr(config, 'PROCESSED_DIR', processed_dir)
-    monkeypatch.setattr(config, 'VECTOR_STORE_PATH', vector_store_dir)
-
-    # 3. Initialize the real dependencies
+    docs_dir, _, _ = isolated_config
+
+    # 1. Initialize the real dependencies
     state_manager = StateManager()
     
-    vector_store = VectorStore(persist_directory=str(vector_store_dir))
+    # Shares the session's database and embedding model, in a collection of its own
+    vector_store = make_vector_store()
 
-    # 4. Initialize the DocumentProcessor with the real dependencies
+    # 2. Initialize the DocumentProcessor with the real dependencies
     processor = DocumentProcessor(vector_store, state_manager)
 
     yield processor, state_manager, vector_store, docs_dir
@@ -45,7 +29,6 @@ async def test_process_new_file(processor_with_real_dependencies):
     """Verify that a new file is processed, chunked, and added to the vector store."""
     processor, state_manager, vector_store, docs_dir = processor_with_real_dependencies
     await state_manager.load_existing_state()
-    await vector_store.initialize()
     
     # Create a new document
     file_path = docs_dir / "new_doc.txt"
@@ -70,7 +53,6 @@ async def test_skip_unchanged_file(processor_with_real_dependencies):
     """Verify that a previously processed, unchanged file is skipped."""
     processor, state_manager, vector_store, docs_dir = processor_with_real_dependencies
     await state_manager.load_existing_state()
-    await vector_store.initialize()
     
     # 1. First run: process a new file
     file_path = docs_dir / "stable_doc.txt"
@@ -95,7 +77,6 @@ async def test_process_modified_file(processor_with_real_dependencies):
     """Verify that a modified file is re-processed and updated in the vector store."""
     processor, state_manager, vector_store, docs_dir = processor_with_real_dependencies
     await state_manager.load_existing_state()
-    await vector_store.initialize()
     
     # 1. First run with original content
     file_path = docs_dir / "modified_doc.txt"
@@ -120,3 +101,48 @@ async def test_process_modified_file(processor_with_real_dependencies):
     # Verify old content is gone
     results3 = await vector_store.search("Original version")
     assert all("Original version" not in r["content"] for r in results3)
+
+@pytest.mark.asyncio
+async def test_every_supported_text_format_is_processed(processor_with_real_dependencies):
+    """Verify that HTML and JSON files are read as text and marked processed, not retried forever."""
+    processor, state_manager, vector_store, docs_dir = processor_with_real_dependencies
+    await state_manager.load_existing_state()
+    html_path = docs_dir / "page.html"
+    html_path.write_text("<html><body><p>Lighthouse keepers log the weather.</p></body></html>")
+    json_path = docs_dir / "record.json"
+    json_path.write_text('{"note": "Glaciers advance in cold winters."}')
+
+    await processor.process_changed_files_only()
+
+    assert str(html_path) in state_manager.known_files
+    assert str(json_path) in state_manager.known_files
+    assert vector_store.get_collection_stats()['total_documents'] == 2
+    assert not state_manager.get_files_to_process(str(docs_dir))
+
+def test_fast_text_splitter_prefers_paragraph_breaks():
+    """Verify chunks stay within chunk_size and are cut at the best separator."""
+    splitter = FastTextSplitter(chunk_size=50, chunk_overlap=10, separators=config.CHUNK_SEPARATORS)
+    text = "First paragraph is here.\n\nSecond paragraph follows it.\n\n" * 5
+
+    chunks = splitter.split_text(text)
+
+    assert chunks[0] == "First paragraph is here."
+    assert all(len(chunk) <= 50 for chunk in chunks)
+
+def test_fast_text_splitter_cuts_markdown_at_heading_after_blank_line():
+    """Verify a heading after a blank line is a break point and starts its own chunk."""
+    splitter = FastTextSplitter(*config.CHUNK_SETTINGS_BY_EXTENSION[".md"])
+    text = "Intro sentence number one. " * 25 + "\n\n# Heading\n" + "Body text here. " * 50
+
+    chunks = splitter.split_text(text)
+
+    assert "# Heading" not in chunks[0]
+    assert chunks[1].startswith("# Heading")
+
+def test_chunk_stream_matches_whole_text_split():
+    """Verify that streaming a document in pieces yields the same chunks as one split."""
+    splitter = FastTextSplitter(chunk_size=100, chunk_overlap=20, separators=config.CHUNK_SEPARATORS)
+    text = " ".join(f"word{i}" for i in range(2000))
+    pieces = [text[i:i + 700] for i in range(0, len(text), 700)]
+
+    assert list(chunk_stream(pieces, splitter, window=1000)) == splitter.split_text(text)
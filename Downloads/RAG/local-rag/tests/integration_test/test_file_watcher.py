@@ -0,0 +1,130 @@
+import asyncio
+import os
+import pytest
+import pytest_asyncio
+from unittest.mock import MagicMock, AsyncMock
+from watchdog.events import DirCreatedEvent, FileCreatedEvent, FileDeletedEvent, FileModifiedEvent
+
+from src.document_processor import DocumentProcessor
+from src import config
+from src.file_watcher import DocumentEventHandler, FileWatcher
+from src.state_manager import StateManager
+from src.vector_store import VectorStore
+
+@pytest_asyncio.fixture
+async def watcher_handler(isolated_config):
+    """
+    A DocumentEventHandler on the test's event loop with a real StateManager
+    and mocked vector store and document processor; returns (handler, docs_dir).
+    """
+    docs_dir, _, _ = isolated_config
+    state_manager = StateManager()
+
+    mock_vector_store = MagicMock(spec=VectorStore)
+    mock_vector_store.rename_source = AsyncMock(return_value=True)
+    mock_vector_store.remove_document = AsyncMock()
+
+    mock_processor = MagicMock(spec=DocumentProcessor)
+    mock_processor.state_manager = state_manager
+    mock_processor.processing_lock = asyncio.Lock()
+    mock_processor.process_file_batch = AsyncMock()
+
+    handler = DocumentEventHandler(mock_vector_store, mock_processor, asyncio.get_running_loop())
+    yield handler, docs_dir
+    state_manager.close()
+
+async def deliver(handler, *events):
+    """Dispatch watchdog events and let the loop record them, as the observer thread would."""
+    for event in events:
+        handler.dispatch(event)
+    await asyncio.sleep(0)
+
+@pytest.mark.asyncio
+async def test_repeated_events_are_processed_once(watcher_handler):
+    """Verify that a burst of events for one file is coalesced into a single processing call."""
+    handler, docs_dir = watcher_handler
+    file_path = str(docs_dir / "notes.txt")
+    (docs_dir / "notes.txt").write_text("Saved several times in a row.")
+
+    await deliver(handler, FileCreatedEvent(file_path), *(FileModifiedEvent(file_path) for _ in range(5)))
+
+    # Still inside the debounce delay: nothing is processed yet
+    await handler.flush()
+    handler.document_processor.process_file_batch.assert_not_awaited()
+
+    await handler.flush(force=True)
+    handler.document_processor.process_file_batch.assert_awaited_once_with([file_path])
+    handler.vector_store.remove_document.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_delete_then_create_with_same_content_is_a_rename(watcher_handler):
+    """Verify that a deleted file reappearing under a new name moves its chunks instead of re-embedding."""
+    handler, docs_dir = watcher_handler
+    state_manager = handler.document_processor.state_manager
+    old_path = str(docs_dir / "report.txt")
+    new_path = str(docs_dir / "report_final.txt")
+    (docs_dir / "report.txt").write_text("Quarterly numbers.")
+    state_manager.mark_file_processed(old_path, state_manager.get_content_signature(old_path))
+    # A rename keeps the mtime, so the signatures match
+    os.rename(old_path, new_path)
+
+    await deliver(handler, FileDeletedEvent(old_path), FileCreatedEvent(new_path))
+    await handler.flush(force=True)
+
+    handler.vector_store.rename_source.assert_awaited_once_with(old_path, new_path)
+    handler.vector_store.remove_document.assert_not_awaited()
+    handler.document_processor.process_file_batch.assert_not_awaited()
+    assert new_path in state_manager.known_files
+    assert old_path not in state_manager.known_files
+
+@pytest.mark.asyncio
+async def test_delete_then_create_with_other_content_is_not_a_rename(watcher_handler):
+    """Verify that a new file with different content is processed and the deleted one removed."""
+    handler, docs_dir = watcher_handler
+    state_manager = handler.document_processor.state_manager
+    old_path = str(docs_dir / "report.txt")
+    new_path = str(docs_dir / "other.txt")
+    (docs_dir / "report.txt").write_text("Quarterly numbers.")
+    state_manager.mark_file_processed(old_path, state_manager.get_content_signature(old_path))
+    os.remove(old_path)
+    (docs_dir / "other.txt").write_text("Something else entirely.")
+
+    await deliver(handler, FileDeletedEvent(old_path), FileCreatedEvent(new_path))
+    await handler.flush(force=True)
+
+    handler.vector_store.rename_source.assert_not_awaited()
+    handler.vector_store.remove_document.assert_awaited_once_with(old_path)
+    handler.document_processor.process_file_batch.assert_awaited_once_with([new_path])
+
+@pytest.mark.asyncio
+async def test_ignored_and_unsupported_files_are_filtered(watcher_handler):
+    """Verify that temporary, hidden and unsupported files and directories never reach processing."""
+    handler, docs_dir = watcher_handler
+    ignored = [".hidden.txt", "~$report.docx", "draft.txt~", "notes.md.swp", "paper.pdf.part",
+               "upload.pdf.crdownload", "image.png"]
+
+    await deliver(
+        handler,
+        DirCreatedEvent(str(docs_dir / "subfolder.txt")),
+        *(FileCreatedEvent(str(docs_dir / name)) for name in ignored),
+        FileCreatedEvent(str(docs_dir / "notes.md")),
+    )
+
+    assert list(handler._pending) == [str(docs_dir / "notes.md")]
+
+@pytest.mark.asyncio
+async def test_stop_processes_events_still_being_debounced(watcher_handler, monkeypatch):
+    """Verify that stopping the watcher flushes events that arrived within the debounce delay."""
+    handler, docs_dir = watcher_handler
+    monkeypatch.setattr(config, 'WATCH_BACKEND', 'watchdog')
+    monkeypatch.setattr(config, 'WATCH_DIRECTORY', str(docs_dir))
+    watcher = FileWatcher(handler.vector_store, handler.document_processor)
+    watcher.start()
+    file_path = str(docs_dir / "late.txt")
+    (docs_dir / "late.txt").write_text("Saved right before shutdown.")
+
+    await deliver(watcher.event_handler, FileModifiedEvent(file_path))
+    await watcher.stop()
+
+    handler.document_processor.process_file_batch.assert_awaited_once_with([file_path])
+    assert watcher._debounce_task.done()
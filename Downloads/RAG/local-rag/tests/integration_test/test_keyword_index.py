@@ -0,0 +1,52 @@
+import pytest
+from src.keyword_index import KeywordIndex
+
+@pytest.fixture
+def keyword_index(tmp_path):
+    """A KeywordIndex on a fresh database file, closed after the test."""
+    index = KeywordIndex(str(tmp_path / "keywords.db"))
+    index.open()
+    yield index
+    index.close()
+
+def add_chunks(index, source, *contents):
+    ids = [f"{source}_{i}" for i in range(len(contents))]
+    index.add(ids, list(contents), [{"source": source, "chunk_index": i} for i in range(len(contents))])
+    return ids
+
+def test_search_finds_exact_terms(keyword_index):
+    """Verify that chunks containing a query term are found, best match first."""
+    add_chunks(keyword_index, "a.txt", "Error code XJ-4471 means the disk is full.", "Nothing relevant here.")
+    add_chunks(keyword_index, "b.txt", "Restart after XJ-4471 and XJ-4471 again.")
+
+    results = keyword_index.search("XJ-4471", limit=10)
+
+    assert [chunk_id for chunk_id, _ in results] == ["b.txt_0", "a.txt_0"]
+    assert results[1][1]["metadata"] == {"source": "a.txt", "chunk_index": 0}
+    assert "disk is full" in results[1][1]["content"]
+
+def test_search_ignores_query_operators(keyword_index):
+    """Verify that FTS5 syntax in a query is treated as plain words."""
+    add_chunks(keyword_index, "a.txt", "Apples AND oranges.")
+
+    assert keyword_index.search('"AND" OR NEAR(', limit=10)[0][0] == "a.txt_0"
+    assert keyword_index.search("?!", limit=10) == []
+
+def test_re_adding_replaces_chunks(keyword_index):
+    """Verify that re-adding a chunk id replaces its text in the index."""
+    add_chunks(keyword_index, "a.txt", "The original wording.")
+    add_chunks(keyword_index, "a.txt", "The updated wording.")
+
+    assert keyword_index.count() == 1
+    assert keyword_index.search("original", limit=10) == []
+    assert keyword_index.search("updated", limit=10)[0][0] == "a.txt_0"
+
+def test_remove_source_drops_only_its_chunks(keyword_index):
+    """Verify that removing a document drops its chunks and keeps the others searchable."""
+    add_chunks(keyword_index, "a.txt", "Shared term in the first file.", "More shared text.")
+    add_chunks(keyword_index, "b.txt", "Shared term in the second file.")
+
+    keyword_index.remove_source("a.txt")
+
+    assert keyword_index.count() == 1
+    assert [chunk_id for chunk_id, _ in keyword_index.search("shared", limit=10)] == ["b.txt_0"]
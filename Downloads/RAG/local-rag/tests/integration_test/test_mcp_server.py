@@ -1,9 +1,7 @@
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-
+import asyncio
+import httpx
 import pytest
-from fastapi.testclient import TestClient
+import pytest_asyncio
 from unittest.mock import MagicMock, AsyncMock
 
 from src.mcp_server import MCPServer
@@ -18,56 +16,66 @@ def mock_dependencies():
     mock_state_manager.last_processed_time = "2023-10-27T10:00:00Z"
 
     mock_vector_store = MagicMock(spec=VectorStore)
-    mock_vector_store.search = AsyncMock(return_value=[
-        {"content": "search result", "metadata": {"source": "doc1.txt"}, "score": 0.9}
+    mock_vector_store.search_many = AsyncMock(side_effect=lambda queries, limit=10, limits=None: [
+        [{"content": "search result", "metadata": {"source": "doc1.txt"}, "score": 0.9}]
+        for _ in queries
     ])
     mock_vector_store.get_collection_stats = MagicMock(return_value={"total_documents": 1})
     mock_vector_store.remove_document = AsyncMock()
 
     return mock_state_manager, mock_vector_store
 
-@pytest.fixture
-def client(mock_dependencies):
-    """Provides a TestClient instance for the MCPServer with mocked dependencies."""
+@pytest_asyncio.fixture
+async def client(mock_dependencies):
+    """Provides an async HTTP client that calls the MCPServer app in-process, with mocked dependencies."""
     mock_state_manager, mock_vector_store = mock_dependencies
     
     # We pass the mocked dependencies to the server
     server = MCPServer(vector_store=mock_vector_store, state_manager=mock_state_manager)
     
-    # The TestClient wraps the FastAPI app
-    with TestClient(server.app) as test_client:
+    # ASGITransport dispatches straight to the FastAPI app on the test's event loop
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as test_client:
         yield test_client
+        
+    # Searches start the server's batching task; stop it with the test's loop
+    if server._search_batcher:
+        server._search_batcher.cancel()
 
-def test_health_check(client):
+@pytest.mark.asyncio
+async def test_health_check(client):
     """Test the /health endpoint."""
-    response = client.get("/health")
+    response = await client.get("/health")
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
     assert data["total_documents"] == 1
     assert "uptime_seconds" in data
 
-def test_search_documents(client):
+@pytest.mark.asyncio
+async def test_search_documents(client):
     """Test the /search endpoint."""
-    response = client.post("/search", json={"query": "test query", "limit": 5})
+    response = await client.post("/search", json={"query": "test query", "limit": 5})
     assert response.status_code == 200
     data = response.json()
     assert data["total_found"] == 1
     assert data["results"][0]["content"] == "search result"
 
-def test_list_documents(client):
+@pytest.mark.asyncio
+async def test_list_documents(client):
     """Test the /documents endpoint."""
-    response = client.get("/documents")
+    response = await client.get("/documents")
     assert response.status_code == 200
     data = response.json()
     assert data["total_documents"] == 1
 
-def test_delete_document(client, mock_dependencies):
+@pytest.mark.asyncio
+async def test_delete_document(client, mock_dependencies):
     """Test the /documents/{file_path} endpoint."""
     _, mock_vector_store = mock_dependencies
     file_path = "path/to/my/doc.txt"
     
-    response = client.delete(f"/documents/{file_path}")
+    response = await client.delete(f"/documents/{file_path}")
     
     assert response.status_code == 200
     assert response.json() == {"message": f"Document {file_path} removed successfully"}
@@ -75,14 +83,71 @@ def test_delete_document(client, mock_dependencies):
     # Verify that the underlying method on the mock was called
     mock_vector_store.remove_document.assert_awaited_once_with(file_path)
 
-def test_mcp_handler(client):
+@pytest.mark.asyncio
+async def test_force_reprocess_runs_in_background(mock_dependencies):
+    """Test that /process resets the state and re-runs ingestion without a restart."""
+    mock_state_manager, mock_vector_store = mock_dependencies
+    mock_processor = MagicMock()
+    mock_processor.processing_lock = asyncio.Lock()
+    mock_processor.process_changed_files_only = AsyncMock()
+    server = MCPServer(mock_vector_store, mock_state_manager, document_processor=mock_processor)
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as test_client:
+        response = await test_client.post("/process")
+    # The reprocess runs as a task on this loop; let it finish
+    await server._reprocess_task
+
+    assert response.status_code == 202
+    mock_state_manager.reset_state.assert_called_once()
+    mock_processor.process_changed_files_only.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_force_reprocess_waits_for_watcher_pass(mock_dependencies):
+    """Test that the background reprocess does not overlap a pass holding the processing lock."""
+    mock_state_manager, mock_vector_store = mock_dependencies
+    mock_processor = MagicMock()
+    mock_processor.processing_lock = asyncio.Lock()
+    mock_processor.process_changed_files_only = AsyncMock()
+    server = MCPServer(mock_vector_store, mock_state_manager, document_processor=mock_processor)
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with mock_processor.processing_lock:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as test_client:
+            response = await test_client.post("/process")
+        await asyncio.sleep(0)
+        assert response.status_code == 202
+        mock_state_manager.reset_state.assert_not_called()
+        mock_processor.process_changed_files_only.assert_not_awaited()
+    await server._reprocess_task
+
+    mock_state_manager.reset_state.assert_called_once()
+    mock_processor.process_changed_files_only.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_mcp_handler(client):
     """Test the /mcp endpoint."""
     request_data = {
         "tool_name": "example_tool",
         "arguments": {"param1": "value1"}
     }
-    response = client.post("/mcp", json=request_data)
+    response = await client.post("/mcp", json=request_data)
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "success"
     assert "result" in data
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_share_one_batch(mock_dependencies):
+    """Test that concurrent searches are answered by a single vector store query."""
+    mock_state_manager, mock_vector_store = mock_dependencies
+    server = MCPServer(vector_store=mock_vector_store, state_manager=mock_state_manager)
+
+    results = await asyncio.gather(
+        server._batched_search("first query", 5),
+        server._batched_search("second query", 3),
+    )
+
+    assert [len(r) for r in results] == [1, 1]
+    mock_vector_store.search_many.assert_awaited_once_with(["first query", "second query"], limits=[5, 3])
+    server._search_batcher.cancel()
@@ -1,47 +1,24 @@
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-
+import asyncio
 import pytest
-import os
 from pathlib import Path
 from unittest.mock import AsyncMock
 
 from src.startup_manager import StartupManager
 from src.state_manager import StateManager
-from src.vector_store import VectorStore
-from src import config
 
 @pytest.fixture
-def setup_full_environment(tmp_path, monkeypatch):
+def setup_full_environment(isolated_config, monkeypatch, make_vector_store):
     """
     Sets up a complete, isolated environment for testing the StartupManager.
     This includes directories for documents, processed state, and the vector store.
     """
-    # 1. Create temporary directories
-    docs_dir = tmp_path / "documents"
-    docs_dir.mkdir()
-    processed_dir = tmp_path / "processed"
-    processed_dir.mkdir()
-    vector_store_dir = tmp_path / "vector_store"
-    vector_store_dir.mkdir()
-
-    # 2. Monkeypatch the config to use these directories
-    monkeypatch.setattr(config, 'DOCUMENTS_DIR', docs_dir)
-    monkeypatch.setattr(config, 'PROCESSED_DIR', processed_dir)
-    monkeypatch.setattr(config, 'VECTOR_STORE_PATH', vector_store_dir)
-    
-    # 3. Override the VectorStore's persist directory in the StartupManager's init
-    # This ensures the manager uses the temp dir from the start.
-    monkeypatch.setattr(
-        'src.startup_manager.VectorStore', 
-        lambda persist_directory: VectorStore(str(vector_store_dir))
-    )
+    # Give the manager a fresh collection backed by the session's shared model.
+    monkeypatch.setattr('src.startup_manager.VectorStore', make_vector_store)
 
-    return docs_dir, processed_dir, vector_store_dir
+    return isolated_config
 
 @pytest.mark.asyncio
-async def test_startup_processes_new_and_cleans_deleted_files(setup_full_environment, monkeypatch):
+async def test_startup_processes_new_and_cleans_deleted_files(setup_full_environment, seed_state, monkeypatch):
     """
     Verify the main startup sequence:
     - Processes new files.
@@ -52,12 +29,9 @@ async def test_startup_processes_new_and_cleans_deleted_files(setup_full_environ
     # --- Setup the scenario ---
     
     # 1. A file that was processed in a "previous run" but is now deleted.
-    # To simulate this, we manually create its state.
+    # To simulate this, we seed its state.
     deleted_file_path = str(docs_dir / "deleted_doc.txt")
-    initial_state = {deleted_file_path: "some_old_signature"}
-    with open(processed_dir / "signatures.json", 'w') as f:
-        import json
-        json.dump(initial_state, f)
+    seed_state({deleted_file_path: "some_old_signature"})
 
     # 2. A new file that exists on disk and needs to be processed.
     new_file_path = docs_dir / "new_doc.txt"
@@ -87,3 +61,44 @@ async def test_startup_processes_new_and_cleans_deleted_files(setup_full_environ
     # Check the vector store (should have only the new file's chunks)
     stats = manager.vector_store.get_collection_stats()
     assert stats['total_documents'] == 1
+
+@pytest.mark.asyncio
+async def test_shutdown_after_cut_short_reprocess_is_not_clean(setup_full_environment):
+    """Verify that a shutdown interrupting a /process reprocess makes the next start scan again."""
+    manager = StartupManager()
+    await manager.state_manager.load_existing_state()
+    manager.file_watcher = None
+    reprocess_started = asyncio.Event()
+
+    async def slow_reprocess():
+        reprocess_started.set()
+        await asyncio.sleep(60)
+
+    manager.mcp_server._reprocess_task = asyncio.create_task(slow_reprocess())
+    await reprocess_started.wait()
+    await manager.shutdown()
+
+    restarted = StateManager()
+    await restarted.load_existing_state()
+    assert not restarted.clean_shutdown
+    restarted.close()
+
+@pytest.mark.asyncio
+async def test_shutdown_flushes_watcher_before_marking_clean(setup_full_environment):
+    """Verify that changes still pending in the watcher are processed before the state is closed."""
+    manager = StartupManager()
+    await manager.state_manager.load_existing_state()
+    order = []
+
+    async def stop_watcher():
+        order.append("watcher stopped")
+
+    def close_state(clean=True):
+        order.append(f"state closed, clean={clean}")
+
+    manager.file_watcher.stop = stop_watcher
+    manager.state_manager.close = close_state
+    await manager.shutdown()
+
+    assert order == ["watcher stopped", "state closed, clean=True"]
+    StateManager.close(manager.state_manager)
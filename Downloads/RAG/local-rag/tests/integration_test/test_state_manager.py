@@ -1,34 +1,17 @@
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-
 import pytest
 import os
 from pathlib import Path
 from src.state_manager import StateManager
 from src import config
 
-# A more robust fixture using pytest's built-in tools
 @pytest.fixture
-def manager_with_temp_env(tmp_path, monkeypatch):
+def manager_with_temp_env(isolated_config):
     """
     A fixture that provides a StateManager instance configured to use
     a temporary, isolated directory structure.
     """
-    # 1. Create a realistic but temporary directory structure
-    docs_dir = tmp_path / "documents"
-    docs_dir.mkdir()
-    processed_dir = tmp_path / "processed"
-    processed_dir.mkdir()
-
-    # 2. Safely override the config for the duration of the test
-    monkeypatch.setattr(config, 'PROCESSED_DIR', processed_dir)
-
-    # 3. Create a manager instance
-    manager = StateManager()
-    
-    # 4. Yield the manager and the paths for the test to use
-    yield manager, docs_dir
+    docs_dir, _, _ = isolated_config
+    yield StateManager(), docs_dir
 
 # --- Individual, focused tests ---
 
@@ -63,6 +46,41 @@ async def test_ignores_unchanged_file_after_processing(manager_with_temp_env):
 
     assert not files_to_process # The set should be empty
 
+@pytest.mark.asyncio
+async def test_unchanged_file_is_not_rehashed(manager_with_temp_env, monkeypatch):
+    """Verify that an unchanged file is skipped from its mtime and size alone."""
+    manager, docs_dir = manager_with_temp_env
+    file_path_str = str(docs_dir / "stable.txt")
+    (docs_dir / "stable.txt").write_text("content")
+    manager.mark_file_processed(file_path_str, manager.get_content_signature(file_path_str))
+
+    def fail_if_called(file_path):
+        raise AssertionError("content signature should not be recomputed")
+    monkeypatch.setattr(manager, "get_content_signature", fail_if_called)
+
+    assert not manager.get_files_to_process(str(docs_dir))
+
+@pytest.mark.asyncio
+async def test_signature_of_unchanged_file_is_reused(manager_with_temp_env):
+    """Verify that a file with the recorded mtime and size is not hashed again."""
+    manager, docs_dir = manager_with_temp_env
+    file_path = docs_dir / "cached.txt"
+    file_path.write_text("content")
+    stat = os.stat(file_path)
+    recorded = f"{stat.st_mtime}_{stat.st_size}_recorded-hash"
+    manager.mark_file_processed(str(file_path), recorded)
+
+    assert manager.get_content_signature(str(file_path)) == recorded
+
+@pytest.mark.asyncio
+async def test_unsupported_files_are_not_scanned(manager_with_temp_env):
+    """Verify that files with unsupported extensions are never queued for processing."""
+    manager, docs_dir = manager_with_temp_env
+    (docs_dir / "notes.TXT").write_text("content")
+    (docs_dir / "image.png").write_bytes(b"\x89PNG")
+
+    assert manager.get_files_to_process(str(docs_dir)) == {str(docs_dir / "notes.TXT")}
+
 @pytest.mark.asyncio
 async def test_detects_modified_file(manager_with_temp_env):
     """Verify that a file with changed content is re-processed."""
@@ -106,3 +124,38 @@ async def test_detects_deleted_file(manager_with_temp_env):
     deleted_files = new_manager.sync_and_get_deleted_files(str(docs_dir))
 
     assert str(file_to_delete) in deleted_files
+
+@pytest.mark.asyncio
+async def test_imports_legacy_json_state(manager_with_temp_env):
+    """Verify that signatures from the old JSON state file carry over to the database."""
+    manager, docs_dir = manager_with_temp_env
+    legacy_state = {str(docs_dir / "old.txt"): "1.0_7_abc"}
+    with open(config.PROCESSED_DIR / "signatures.json", 'w') as f:
+        import json
+        json.dump(legacy_state, f)
+
+    await manager.load_existing_state()
+    assert manager.known_files == legacy_state
+    assert not (config.PROCESSED_DIR / "signatures.json").exists()
+
+    new_manager = StateManager()
+    await new_manager.load_existing_state()
+    assert new_manager.known_files == legacy_state
+
+@pytest.mark.asyncio
+async def test_clean_shutdown_flag_round_trip(manager_with_temp_env):
+    """Verify that only a closed state is reported as a clean shutdown on the next load."""
+    manager, _ = manager_with_temp_env
+    await manager.load_existing_state()
+    assert manager.clean_shutdown is False
+    manager.close()
+
+    # Restart after a clean close
+    restarted = StateManager()
+    await restarted.load_existing_state()
+    assert restarted.clean_shutdown is True
+
+    # Restart after a crash (never closed)
+    crashed = StateManager()
+    await crashed.load_existing_state()
+    assert crashed.clean_shutdown is False
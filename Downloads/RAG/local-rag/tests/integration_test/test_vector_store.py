@@ -1,25 +1,15 @@
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-
+import asyncio
 import pytest
 from src.vector_store import VectorStore
 from pathlib import Path
 
 @pytest.fixture
-def vector_store_with_temp_db(tmp_path):
+def vector_store_with_temp_db(make_vector_store):
     """
-    A fixture that provides a VectorStore instance initialized with
-    a temporary, isolated ChromaDB database.
+    A fixture that provides a VectorStore instance with its own, empty
+    collection in the session's shared ChromaDB database.
     """
-    # The persist_directory will be a unique temp folder created by pytest
-    persist_directory = str(tmp_path / "test_chroma_db")
-    
-    store = VectorStore(persist_directory=persist_directory)
-    
-    yield store
-    
-    # No explicit cleanup needed; tmp_path handles directory removal.
+    return make_vector_store()
 
 @pytest.mark.asyncio
 async def test_add_and_search_document(vector_store_with_temp_db):
@@ -126,3 +116,144 @@ async def test_get_collection_stats(vector_store_with_temp_db):
     
     stats2 = store.get_collection_stats()
     assert stats2['total_documents'] == 2
+
+@pytest.mark.asyncio
+async def test_rename_source_keeps_chunks(vector_store_with_temp_db):
+    """Verify that renaming a document moves its chunks to the new path."""
+    store = vector_store_with_temp_db
+    await store.initialize()
+    old_path = "test/old_name.txt"
+    new_path = "test/new_name.txt"
+    chunks = [
+        {"content": "Renamed files keep their chunks.", "metadata": {"source": old_path, "chunk": 0}},
+        {"content": "No embedding is recomputed.", "metadata": {"source": old_path, "chunk": 1}},
+    ]
+    await store.add_document_chunks(old_path, chunks)
+
+    assert await store.rename_source(old_path, new_path)
+    assert store.get_collection_stats()['total_documents'] == 2
+
+    search_results = await store.search("renamed files")
+    assert search_results[0]['metadata']['source'] == str(Path(new_path).resolve())
+    assert not await store.rename_source(old_path, new_path)
+
+@pytest.mark.asyncio
+async def test_chunk_counter_matches_collection(vector_store_with_temp_db):
+    """Verify the maintained chunk counter agrees with Chroma's count after every kind of write."""
+    store = vector_store_with_temp_db
+    await store.initialize()
+    file_path = "test/counted.txt"
+    new_path = "test/counted_renamed.txt"
+
+    def chunks(*contents):
+        return [{"content": content, "metadata": {"source": file_path, "chunk": i}}
+                for i, content in enumerate(contents)]
+
+    def assert_counter_matches():
+        assert store.get_collection_stats()['total_documents'] == store.collection.count()
+
+    await store.add_document_chunks(file_path, chunks("One.", "Two.", "Three."))
+    assert_counter_matches()
+
+    await store.add_document_chunks(file_path, chunks("One, updated.", "Two, updated."))
+    assert_counter_matches()
+
+    # Overlapping writes of the same file must not count its chunks twice
+    for _ in range(3):
+        await asyncio.gather(*(store.add_document_chunks(file_path, chunks("A.", "B.", "C.")) for _ in range(4)))
+        assert_counter_matches()
+
+    assert await store.rename_source(file_path, new_path)
+    assert_counter_matches()
+
+    await store.remove_document(new_path)
+    assert_counter_matches()
+    assert store.get_collection_stats()['total_documents'] == 0
+
+@pytest.mark.asyncio
+async def test_search_keyword_follows_writes(vector_store_with_temp_db):
+    """Verify that keyword search sees added, renamed and removed chunks."""
+    store = vector_store_with_temp_db
+    await store.initialize()
+    old_path = "test/keywords.txt"
+    new_path = "test/keywords_renamed.txt"
+    chunks = [
+        {"content": "Part number QZ-88 ships in March.", "metadata": {"source": old_path, "chunk": 0}},
+        {"content": "Unrelated text.", "metadata": {"source": old_path, "chunk": 1}},
+    ]
+    await store.add_document_chunks(old_path, chunks)
+
+    [results] = await store.search_keyword(["QZ-88"], limit=5)
+    assert [result['metadata']['source'] for _, result in results] == [str(Path(old_path).resolve())]
+
+    assert await store.rename_source(old_path, new_path)
+    [results] = await store.search_keyword(["QZ-88"], limit=5)
+    assert [result['metadata']['source'] for _, result in results] == [str(Path(new_path).resolve())]
+
+    await store.remove_document(new_path)
+    assert await store.search_keyword(["QZ-88"], limit=5) == [[]]
+
+@pytest.mark.asyncio
+async def test_keyword_index_backfilled_for_existing_collection(vector_store_with_temp_db):
+    """Verify that a collection without a keyword index gets one built from its chunks on open."""
+    store = vector_store_with_temp_db
+    await store.initialize()
+    file_path = "test/backfill.txt"
+    chunks = [
+        {"content": "Backfilled chunk about zeppelins.", "metadata": {"source": file_path, "chunk": 0}},
+        {"content": "Another backfilled chunk.", "metadata": {"source": file_path, "chunk": 1}},
+    ]
+    await store.add_document_chunks(file_path, chunks)
+
+    # As if the collection predated the keyword index
+    store.keyword_index.remove_source(str(Path(file_path).resolve()))
+    assert store.keyword_index.count() == 0
+    store.keyword_index.close()
+
+    reopened = VectorStore(
+        persist_directory=store.persist_directory,
+        collection_name=store.collection_name,
+        embedding_function=store.embedding_function,
+    )
+    await reopened.initialize()
+    try:
+        assert reopened.keyword_index.count() == 2
+        [results] = await reopened.search_keyword(["zeppelins"], limit=5)
+        assert "zeppelins" in results[0][1]['content']
+    finally:
+        reopened.keyword_index.close()
+        store.keyword_index = None  # already closed
+
+def test_fuse_rankings_orders_by_reciprocal_rank():
+    """Verify that fused results favour chunks ranked high by both backends."""
+    def ranking(*chunk_ids):
+        return [(chunk_id, {'content': chunk_id, 'metadata': {}, 'score': 0.0}) for chunk_id in chunk_ids]
+
+    fused = VectorStore._fuse_rankings([ranking("a", "b", "c"), ranking("c", "a")], limit=10)
+
+    assert [result['content'] for result in fused] == ["a", "c", "b"]
+    assert fused[0]['score'] < 1.0
+
+    both_first = VectorStore._fuse_rankings([ranking("a", "b"), ranking("a")], limit=1)
+    assert [(result['content'], result['score']) for result in both_first] == [("a", 1.0)]
+
+@pytest.mark.asyncio
+async def test_batched_queries_rank_like_single_queries(vector_store_with_temp_db):
+    """Verify that a query batched with a larger one returns what it would return alone."""
+    store = vector_store_with_temp_db
+    await store.initialize()
+    file_path = "test/batched.txt"
+    # Distinct relevance per chunk, so no ties decide the order
+    topics = ["river", "delta", "sediment", "report", "estuary", "tide", "silt", "levee"]
+    chunks = [
+        {"content": " ".join(topics[:i + 1]) + ".", "metadata": {"source": file_path, "chunk": i}}
+        for i in range(8)
+    ]
+    await store.add_document_chunks(file_path, chunks)
+
+    alone = await store.search("estuary tide silt", limit=2)
+    store._invalidate_search_results()
+    batched = await store.search_many(["estuary tide silt", "river delta"], limits=[2, 8])
+
+    assert batched[0] == alone
+    assert len(batched[1]) == 8
@@ -1,12 +1,20 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 from pathlib import Path
 
-# Load .env from the project root directory
+# .env in the project root directory
 env_path = Path(__file__).parents[2] / '.env'
-load_dotenv(env_path)
 
 class Settings:
-    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+    def __init__(self):
+        # Variables already set in the environment take precedence over .env
+        load_dotenv(env_path, override=False)
+        self.ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+        self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+        self.DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """The process-wide settings; .env is read the first time they are needed"""
+    return Settings()
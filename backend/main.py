@@ -1,31 +1,40 @@
+from functools import lru_cache
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from .models import AnthropicModel, OpenAIModel, DeepseekModel
-from .config.settings import Settings
+from .config.settings import get_settings
 
-app = FastAPI()
-settings = Settings()
+app = FastAPI(default_response_class=ORJSONResponse)
 
-# Initialize models
-anthropic_model = AnthropicModel(settings.ANTHROPIC_API_KEY)
-openai_model = OpenAIModel(settings.OPENAI_API_KEY)
-deepseek_model = DeepseekModel(settings.DEEPSEEK_API_KEY)
+# Model constructors by request name; clients, and the settings they read, are only loaded when first used
+MODELS = {
+    "claude": lambda: AnthropicModel(get_settings().ANTHROPIC_API_KEY),
+    "gpt": lambda: OpenAIModel(get_settings().OPENAI_API_KEY),
+    "deepseek": lambda: DeepseekModel(get_settings().DEEPSEEK_API_KEY),
+}
+
+@lru_cache(maxsize=None)
+def get_model(name: str):
+    """One shared client per model"""
+    return MODELS[name]()
 
 class ChatRequest(BaseModel):
     message: str
     model: str
+    stream: bool = False  # Send the reply as plain text while it is generated
 
 @app.post("/chat")
 async def chat(request: ChatRequest):
+    if request.model not in MODELS:
+        raise HTTPException(status_code=400, detail="Invalid model specified")
     try:
-        if request.model == "claude":
-            return await anthropic_model.generate_response(request.message)
-        elif request.model == "gpt":
-            return await openai_model.generate_response(request.message)
-        elif request.model == "deepseek":
-            return await deepseek_model.generate_response(request.message)
-        else:
-            raise HTTPException(status_code=400, detail="Invalid model specified")
+        model = get_model(request.model)
+        if request.stream:
+            return StreamingResponse(
+                model.stream_response(request.message), media_type="text/plain; charset=utf-8"
+            )
+        return await model.generate_response(request.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
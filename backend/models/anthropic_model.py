@@ -1,13 +1,14 @@
 import anthropic
-from typing import Dict
+from typing import AsyncIterator, Dict
 
 class AnthropicModel:
     def __init__(self, api_key: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+        # Async client: awaiting the call keeps the event loop free for other requests
+        self.client = anthropic.AsyncAnthropic(api_key=api_key)
     
     async def generate_response(self, message: str) -> Dict[str, str]:
         try:
-            response = self.client.messages.create(
+            response = await self.client.messages.create(
                 model="claude-2",
                 max_tokens=1000,
                 messages=[{"role": "user", "content": message}]
@@ -15,3 +16,15 @@ class AnthropicModel:
             return {"response": response.content[0].text}
         except Exception as e:
             return {"error": str(e)}
+    
+    async def stream_response(self, message: str) -> AsyncIterator[str]:
+        try:
+            async with self.client.messages.stream(
+                model="claude-2",
+                max_tokens=1000,
+                messages=[{"role": "user", "content": message}]
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+        except Exception as e:
+            yield f"\n[error: {e}]"
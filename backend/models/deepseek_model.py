@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import AsyncIterator, Dict
 
 class DeepseekModel:
     def __init__(self, api_key: str):
@@ -7,3 +7,7 @@ class DeepseekModel:
     async def generate_response(self, message: str) -> Dict[str, str]:
         # Placeholder for DeepSeek implementation
         return {"response": "DeepSeek API implementation pending"}
+    
+    async def stream_response(self, message: str) -> AsyncIterator[str]:
+        # Placeholder for DeepSeek implementation
+        yield "DeepSeek API implementation pending"
@@ -1,16 +1,29 @@
 import openai
-from typing import Dict
+from typing import AsyncIterator, Dict
 
 class OpenAIModel:
     def __init__(self, api_key: str):
-        self.client = openai.OpenAI(api_key=api_key)
+        self.client = openai.AsyncOpenAI(api_key=api_key)
     
     async def generate_response(self, message: str) -> Dict[str, str]:
         try:
-            completion = self.client.chat.completions.create(
+            completion = await self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": message}]
             )
             return {"response": completion.choices[0].message.content}
         except Exception as e:
             return {"error": str(e)}
+    
+    async def stream_response(self, message: str) -> AsyncIterator[str]:
+        try:
+            stream = await self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": message}],
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            yield f"\n[error: {e}]"
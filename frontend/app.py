@@ -34,15 +34,21 @@ if prompt := st.chat_input():
     try:
         response = requests.post(
             "http://localhost:8000/chat",
-            json={"message": prompt, "model": model}
+            json={"message": prompt, "model": model, "stream": True},
+            stream=True
         )
         response.raise_for_status()
-        assistant_response = response.json()["response"]
+
+        # Show the reply as it arrives
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
+            assistant_response = ""
+            for text in response.iter_content(chunk_size=None, decode_unicode=True):
+                assistant_response += text
+                placeholder.write(assistant_response)
 
         # Add assistant response to chat history
         st.session_state.messages.append({"role": "assistant", "content": assistant_response})
-        with st.chat_message("assistant"):
-            st.write(assistant_response)
 
     except requests.exceptions.RequestException as e:
         st.error(f"Error communicating with the backend: {str(e)}")